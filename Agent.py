@@ -1,226 +1,813 @@
-from copy import deepcopy
+import os
+import time
+from array import array
+from itertools import product
+
+import BatchEval
+from Grid import DIRECTIONS, OFF_BOARD, Grid
+from MoveOrdering import MoveOrdering
+from Symmetry import SYMMETRIC_TT, Symmetry
+from Territory import territory
+from TranspositionTable import EXACT, LOWER, UPPER, TranspositionTable, ZobristKeys
+from Weights import WEIGHTS
+
+# Score given to a snake that has been eliminated
+LOSS = -1000
+
+# Time kept back from the game's move timeout for network latency, in milliseconds
+MARGIN_MS = int(os.environ.get("SEARCH_MARGIN_MS", "100"))
+
+# Depth stored for finished games, which no deeper search can change
+TERMINAL = 1 << 30
+
+# Search algorithm: "maxn", "paranoid", or "auto" to choose by the number of snakes
+SEARCH_MODE = os.environ.get("SEARCH_MODE", "auto")
+
+# In auto mode, games with at least this many snakes are searched with paranoid alpha-beta;
+# at the default of 2 that is every game with an opponent, and only solo games use maxN
+PARANOID_MIN_SNAKES = int(os.environ.get("PARANOID_MIN_SNAKES", "2"))
+
+# Mixed into the hash of paranoid entries, whose scores are single values for our snake
+PARANOID_KEY = 0x9E3779B97F4A7C15
+
+# Leaves are scored with NumPy in one batch when a node has at least this many children
+BATCH_MIN_CHILDREN = 16
+
+# Move timeout used when the request does not carry one, in milliseconds
+DEFAULT_TIMEOUT_MS = 500
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search once the move deadline has passed."""
+
+
+def searchMode(numSnakes, mode=SEARCH_MODE):
+    """Returns the search algorithm, "maxn" or "paranoid", used for a game with numSnakes snakes."""
+    # Paranoid alpha-beta whenever there is at least one opponent (by default), as it
+    # searched deeper than maxN with 2, 3 and 4 snakes alike; maxN for solo games
+    if mode == "auto":
+        return "paranoid" if numSnakes >= PARANOID_MIN_SNAKES else "maxn"
+    return mode
+
 
 class State:
 
-    def __init__(self, board, snakes, height, width, numPlayers, food):
-        # reference to the current state of the game board
-        self.board = board
+    def __init__(self, snakes, height, width, numPlayers, food, ruleset="standard"):
+        # Cells are indexed as y * width + x, food is a bitmask over cell indices
         self.snakes = snakes
         self.height = height
         self.width = width
+        self.grid = Grid.forBoard(width, height, ruleset)
         self.numPlayers = numPlayers
         self.food = food
+        # Undo records for apply(), most recent last
+        self.history = []
+        # Zobrist keys and the position hash, kept up to date once hashing is enabled
+        self.zobrist = None
+        self.hash = 0
+        # Keys and hashes of the position's mirror images, when hashing covers symmetries
+        self.mirrors = ()
+        self.mirrorHashes = ()
+
+    @classmethod
+    def fromBoard(cls, board, ruleset="standard"):
+        """Builds a compact state from the "board" object of a Battlesnake request."""
+        height = board["height"]
+        width = board["width"]
+        snakes = [Snake(snake, width, height, index) for index, snake in enumerate(board["snakes"])]
+        food = 0
+        for point in board["food"]:
+            food |= 1 << (point["y"] * width + point["x"])
+        return cls(snakes, height, width, len(snakes), food, ruleset)
+
+    @classmethod
+    def fromRequest(cls, game):
+        """Builds a compact state from a whole Battlesnake request, using its ruleset."""
+        ruleset = game.get("game", {}).get("ruleset", {}).get("name", "standard")
+        return cls.fromBoard(game["board"], ruleset)
+
+    def copy(self):
+        state = State(
+            [snake.copy() for snake in self.snakes],
+            self.height,
+            self.width,
+            self.numPlayers,
+            self.food,
+        )
+        state.grid = self.grid
+        state.zobrist = self.zobrist
+        state.hash = self.hash
+        state.mirrors = self.mirrors
+        state.mirrorHashes = self.mirrorHashes
+        return state
+
+    def enableHashing(self, zobrist=None, symmetry=None):
+        """
+        Computes the Zobrist hash of the position and keeps it updated from then on. Given
+        the board's Symmetry, the hashes of the position's mirror images are kept as well,
+        for canonicalKey().
+        """
+        if zobrist is None:
+            zobrist = ZobristKeys.forBoard(self.width, self.height, self.numPlayers)
+        self.zobrist = zobrist
+        self.hash = zobrist.foodHash(self.food)
+        for snake in self.snakes:
+            snake.hash = zobrist.snakeHash(snake)
+            self.hash ^= snake.hash
 
-    def updateState(self, direction, snake_name):
+        self.mirrors = tuple(zobrist.mirrored(symmetry)) if symmetry is not None else ()
+        self.mirrorHashes = tuple(keys.foodHash(self.food) for keys in self.mirrors)
         for snake in self.snakes:
-            if snake.name == snake_name:
-                new_head = dict(snake.head)
-                if direction == "up":
-                    new_head["y"] += 1
-                elif direction == "down":
-                    new_head["y"] -= 1
-                elif direction == "left":
-                    new_head["x"] -= 1
-                elif direction == "right":
-                    new_head["x"] += 1
-
-                snake.head = new_head
-                snake.body.insert(0, new_head)
-                snake.body.pop()
+            snake.mirrorHashes = tuple(keys.snakeHash(snake) for keys in self.mirrors)
+            self.mirrorHashes = tuple(h ^ s for h, s in zip(self.mirrorHashes, snake.mirrorHashes))
+
+    def canonicalKey(self):
+        """
+        Returns the smallest hash of the position and its mirror images, and the symmetry
+        transform that gives it (0, the identity, when symmetries are not hashed).
+        """
+        key, t = self.hash, 0
+        for i, h in enumerate(self.mirrorHashes, 1):
+            if h < key:
+                key, t = h, i
+        return key, t
+
+    def step(self, cell, direction):
+        """Returns the cell reached by moving from cell in direction, or OFF_BOARD."""
+        return self.grid.step[direction][cell]
 
+    def apply(self, moves):
+        """
+        Plays one turn in place and pushes an undo record so that undo() can revert it.
+
+        Parameters:
+        - moves (List[str]): One direction per snake in self.snakes, or None for a snake
+        that stays where it is this turn.
+        """
+        snakes = self.snakes
+        zobrist = self.zobrist
+        mirrors = self.mirrors
+        step = self.grid.step
+        saved = []
+        self.history.append((snakes, self.food, self.hash, self.mirrorHashes, saved))
+
+        # Move heads and tails, remembering everything needed to put them back
+        eaten = 0
+        for snake, direction in zip(snakes, moves):
+            if direction is None:
+                saved.append(None)
+                continue
+            health, bodyMask, length, head = snake.health, snake.bodyMask, snake.length, snake.head
+            snake.pushHead(step[direction][head])
+            saved.append((health, bodyMask, length, snake.popTail(), snake.hash, snake.mirrorHashes))
+            snake.health -= 1
+
+            # Feed the snake; every snake that reaches the food eats it
+            if snake.head != OFF_BOARD and self.food >> snake.head & 1:
+                eaten |= 1 << snake.head
+                snake.health = 100
+                snake.grow()
+
+            if zobrist is not None:
+                delta = zobrist.snakeDelta(
+                    snake.index, head, snake.head, bodyMask, snake.bodyMask,
+                    health, snake.health, length, snake.length,
+                )
+                snake.hash ^= delta
+                self.hash ^= delta
+                if mirrors:
+                    deltas = [
+                        keys.snakeDelta(
+                            snake.index, head, snake.head, bodyMask, snake.bodyMask,
+                            health, snake.health, length, snake.length,
+                        )
+                        for keys in mirrors
+                    ]
+                    snake.mirrorHashes = tuple(h ^ d for h, d in zip(snake.mirrorHashes, deltas))
+                    self.mirrorHashes = tuple(h ^ d for h, d in zip(self.mirrorHashes, deltas))
+
+        if eaten:
+            self.food &= ~eaten
+            if zobrist is not None:
+                self.hash ^= zobrist.foodHash(eaten)
+                if mirrors:
+                    self.mirrorHashes = tuple(h ^ keys.foodHash(eaten) for h, keys in zip(self.mirrorHashes, mirrors))
         self.checkCollisions()
 
+    def undo(self):
+        """Reverts the most recent apply()."""
+        snakes, food, hash, mirrorHashes, saved = self.history.pop()
+        for snake, record in zip(snakes, saved):
+            if record is None:
+                continue
+            snake.health, snake.bodyMask, snake.length, tail, snake.hash, snake.mirrorHashes = record
+            snake.headPos = (snake.headPos + 1) & snake.ring
+            snake.head = snake.body[snake.headPos]
+            snake.body[(snake.headPos + snake.length - 1) & snake.ring] = tail
+        self.snakes = snakes
+        self.food = food
+        self.hash = hash
+        self.mirrorHashes = mirrorHashes
 
     def checkCollisions(self):
         """Checks if any snakes have collided and updates the state accordingly."""
         to_remove = set()
 
-        # Check for wall collisions and self-collisions
+        # Snakes that starved or left the board are out before any collisions are checked
         for snake in self.snakes:
-            if (snake.head["x"] < 0 or snake.head["x"] >= self.width or
-                snake.head["y"] < 0 or snake.head["y"] >= self.height or
-                snake.head in [segment for segment in snake.body[1:]]):
+            if snake.head == OFF_BOARD or snake.health <= 0:
                 to_remove.add(snake)
 
-        # Check for collisions with other snakes
+        # Every segment behind a head, across all remaining snakes
+        bodies = 0
+        for snake in self.snakes:
+            if snake not in to_remove:
+                bodies |= snake.bodyMask
+
+        # Check for self-collisions and collisions with other bodies
+        collided = set()
+        for snake in self.snakes:
+            if snake not in to_remove and bodies >> snake.head & 1:
+                collided.add(snake)
+
+        # Check for head-to-head collisions
+        heads = {}
         for snake in self.snakes:
             if snake in to_remove:
                 continue
-            for other_snake in self.snakes:
-                if snake != other_snake:
-                    if snake.head == other_snake.head:
-                        if snake.length <= other_snake.length:
-                            to_remove.add(snake)
-                        if snake.length >= other_snake.length:
-                            to_remove.add(other_snake)
-                    elif snake.head in other_snake.body:
-                        to_remove.add(snake)
-
-        # Remove collided snakes
-        for snake in to_remove:
-            self.snakes.remove(snake)
-
-        # Check for food consumption
+            other_snake = heads.get(snake.head)
+            if other_snake is None:
+                heads[snake.head] = snake
+                continue
+            if snake.length <= other_snake.length:
+                collided.add(snake)
+            if snake.length >= other_snake.length:
+                collided.add(other_snake)
+                heads[snake.head] = snake
+
+        # Remove collided snakes; the old list is kept by the undo record
+        to_remove |= collided
+        if to_remove:
+            self.snakes = [snake for snake in self.snakes if snake not in to_remove]
+            if self.zobrist is not None:
+                for snake in to_remove:
+                    self.hash ^= snake.hash
+                    if self.mirrors:
+                        self.mirrorHashes = tuple(h ^ s for h, s in zip(self.mirrorHashes, snake.mirrorHashes))
+
+    def blockedCells(self):
+        """Bitmask of cells taken by some snake next turn; tails move away unless stacked."""
+        blocked = 0
         for snake in self.snakes:
-            if snake.head in self.food:
-                self.food.remove(snake.head)
-                snake.health = 100
-                snake.length += 1
+            blocked |= snake.bodyMask | (1 << snake.head)
+            if not snake.tailStacked():
+                blocked &= ~(1 << snake.tail())
+        return blocked
 
-    def availableMoves(self, snake_name):
+    def availableMoves(self, snake_name, blocked=None):
         snake = next((s for s in self.snakes if s.name == snake_name), None)
         if snake is None:
             return []
+        return self.snakeMoves(snake, self.blockedCells() if blocked is None else blocked)
 
-        potential_moves = {
-            "up": {"x": snake.head["x"], "y": snake.head["y"] + 1},
-            "down": {"x": snake.head["x"], "y": snake.head["y"] - 1},
-            "left": {"x": snake.head["x"] - 1, "y": snake.head["y"]},
-            "right": {"x": snake.head["x"] + 1, "y": snake.head["y"]}
-        }
-
+    def snakeMoves(self, snake, blocked):
         valid_moves = []
 
-        for direction, move in potential_moves.items():
-            if 0 <= move["x"] < self.width and 0 <= move["y"] < self.height:
-                # Self-collision
-                if any(segment["x"] == move["x"] and segment["y"] == move["y"] for segment in snake.body[:-1]):
-                    continue
-
-                # Other sneks collision
-                collision_with_other_snake = False
-                for other_snake in self.snakes:
-                    if other_snake.name != snake_name:
-                        if any(segment["x"] == move["x"] and segment["y"] == move["y"] for segment in other_snake.body[:-1]):
-                            collision_with_other_snake = True
-                            break
-                
-                if not collision_with_other_snake:
-                    valid_moves.append(direction)
+        for direction, cell in self.grid.neighbors[snake.head]:
+            if not blocked >> cell & 1:
+                valid_moves.append(direction)
 
         return valid_moves
 
+    def jointMoves(self, restrict=None):
+        """
+        Returns the move options of every snake for the next turn, pruned to safe moves.
+
+        Parameters:
+        - restrict (Dict[int, List[str]]): Optional fixed options for some snakes, by index.
+
+        Returns:
+        - List[List[str]]: One list of directions per snake in self.snakes. A snake with
+        no safe move keeps a single move so that it still takes part in the turn.
+        """
+        blocked = self.blockedCells()
+        options = []
+        for snake in self.snakes:
+            if restrict and snake.index in restrict:
+                moves = restrict[snake.index]
+            else:
+                moves = self.snakeMoves(snake, blocked)
+            options.append(moves or [DIRECTIONS[0]])
+        return options
+
 
 class Snake:
-    def __init__(self, snake):
+    __slots__ = ("id", "name", "index", "health", "length", "head", "headPos", "bodyMask", "body", "ring", "hash", "mirrorHashes")
+
+    def __init__(self, snake, width, height, index=0):
+        self.id = snake.get("id", snake["name"])
         self.name = snake["name"]
+        # Position of the snake in the request, which stays fixed as others die
+        self.index = index
         self.health = snake["health"]
-        self.body = snake["body"]
-        self.head = snake["head"]
-        self.length = snake["length"]
+
+        # The body is a ring buffer of cell indices, sized so it can never wrap onto itself
+        capacity = 4
+        while capacity < width * height + 2:
+            capacity *= 2
+        self.ring = capacity - 1
+        self.body = array("h", [0]) * capacity
+        self.headPos = 0
+        self.length = 0
+        self.bodyMask = 0
+        # This snake's share of the position hash and of its mirror images' hashes, see State.enableHashing
+        self.hash = 0
+        self.mirrorHashes = ()
+
+        for point in reversed(snake["body"]):
+            self.pushHead(point["y"] * width + point["x"])
+        # At the start of a game the whole body is stacked under the head
+        self.bodyMask &= ~(1 << self.head)
+
+    def copy(self):
+        snake = Snake.__new__(Snake)
+        snake.id = self.id
+        snake.name = self.name
+        snake.index = self.index
+        snake.health = self.health
+        snake.length = self.length
+        snake.head = self.head
+        snake.headPos = self.headPos
+        snake.bodyMask = self.bodyMask
+        snake.body = array("h", self.body)
+        snake.ring = self.ring
+        snake.hash = self.hash
+        snake.mirrorHashes = self.mirrorHashes
+        return snake
+
+    def segments(self):
+        """Yields the cells of the body from head to tail."""
+        body, ring, headPos = self.body, self.ring, self.headPos
+        for i in range(self.length):
+            yield body[(headPos + i) & ring]
+
+    def tail(self):
+        return self.body[(self.headPos + self.length - 1) & self.ring]
+
+    def tailStacked(self):
+        """True if the tail will stay in place next turn (the snake just ate)."""
+        end = self.headPos + self.length
+        return self.body[(end - 1) & self.ring] == self.body[(end - 2) & self.ring]
+
+    def pushHead(self, cell):
+        # The old head becomes part of the body
+        if self.length:
+            self.bodyMask |= 1 << self.head
+        self.headPos = (self.headPos - 1) & self.ring
+        self.body[self.headPos] = cell
+        self.head = cell
+        self.length += 1
+
+    def popTail(self):
+        self.length -= 1
+        end = self.headPos + self.length
+        tail = self.body[end & self.ring]
+        # Stacked segments share a cell, so only clear it once the last one leaves
+        if self.body[(end - 1) & self.ring] != tail:
+            self.bodyMask &= ~(1 << tail)
+        return tail
+
+    def grow(self):
+        """Duplicates the tail segment, as happens when a snake eats."""
+        tail = self.tail()
+        self.body[(self.headPos + self.length) & self.ring] = tail
+        self.length += 1
 
 
 class AdversarialSearch:
-    def __init__(self, game):
-        # set up current board state
-        board = game["board"]
-        snakes = [Snake(snake) for snake in board["snakes"]]
-        height = board["height"]
-        width = board["height"]
-        self.numPlayers = len(snakes)
-        food = [food for food in board["food"]]
-        self.initial_state = State(board, snakes, height, width, self.numPlayers, food)
-        self.you = Snake(game["you"])
+    def __init__(self, game, maxDepth=None, timeout=None, margin=MARGIN_MS, table=None, mode=SEARCH_MODE, ordering=True, batch=None, session=None, state=None, weights=None, symmetric=SYMMETRIC_TT, started=None):
+        # The move clock starts when the server received the request (a perf_counter
+        # time), or else as soon as the request has been handed to us
+        if started is None:
+            started = time.perf_counter()
+
+        # set up current board state, unless the request parser already built it
+        self.initial_state = State.fromRequest(game) if state is None else state
+        self.numPlayers = self.initial_state.numPlayers
+        # With symmetric hashing, mirror images of a position share one table entry, whose
+        # moves are stored as they are on the canonical board
+        self.symmetry = Symmetry.forBoard(self.initial_state.width, self.initial_state.height)
+        self.initial_state.enableHashing(symmetry=self.symmetry if symmetric else None)
+        you = game["you"]["id"]
+        self.you = next(snake.index for snake in self.initial_state.snakes if snake.id == you)
+
+        self.mode = searchMode(len(self.initial_state.snakes), mode)
+
+        # Positions already searched, shared by every iteration of the deepening loop and,
+        # through the game's session, by every turn of the game
+        self.session = session
+        if table is None:
+            table = TranspositionTable() if session is None else session.table
+        self.table = table
+
+        # Killer and history tables for ordering moves, or None to search in generated order
+        self.ordering = MoveOrdering() if ordering else None
+
+        # maxN scores the children of its last ply in one NumPy pass when NumPy is installed;
+        # the batched search does not handle boards whose edges wrap around
+        if batch is None:
+            batch = BatchEval.available() and not self.initial_state.grid.wrapped
+        self.batch = batch
+
+        # Weights of the evaluation terms, from the tuned weights file unless given
+        self.weights = WEIGHTS if weights is None else weights
+
+        # Search depth limit (None to deepen until the deadline) and the deadline itself
+        self.maxDepth = maxDepth
+        if timeout is None:
+            timeout = game.get("game", {}).get("timeout", DEFAULT_TIMEOUT_MS)
+        self.deadline = started + (timeout - margin) / 1000
+
+        # Statistics of the last findOptimalMove call; completed holds the (depth, move,
+        # our score) of every finished depth, and exact is set once the tree was exhausted
+        self.nodes = 0
+        self.depthReached = 0
+        self.elapsed = 0.0
+        self.completed = []
+        self.exact = False
+
 
-    
     def findOptimalMove(self, safeMoves):
-        newState = deepcopy(self.initial_state)
-        
-        bestMove = None
-        bestValue = float("-inf")
+        """
+        Searches depth 1, 2, 3... until the deadline or maxDepth and returns the best move
+        of the last depth that finished. A depth cut short by the deadline is thrown away.
+        """
+        if not safeMoves:
+            return None
+        started = time.perf_counter()
+        state = self.initial_state
+        restrict = {self.you: safeMoves}
+        base = len(state.history)
+
+        bestMove = safeMoves[0]
+        self.nodes = 0
+        self.depthReached = 0
+        self.completed = []
+        self.exact = False
+        self.table.nextAge()
+        depth = 1
+
+        while self.maxDepth is None or depth <= self.maxDepth:
+            if time.perf_counter() >= self.deadline:
+                break
+            self.cutoff = False
+            # The previous depth's choice is searched first
+            if self.ordering is not None and depth > 1:
+                restrict = {self.you: [bestMove] + [move for move in safeMoves if move != bestMove]}
+            try:
+                if self.mode == "paranoid":
+                    value, move = self.paranoid(state, depth, float("-inf"), float("inf"), restrict)
+                else:
+                    scores, moves = self.maxN(state, depth, restrict)
+                    move = next(move for snake, move in zip(state.snakes, moves) if snake.index == self.you)
+                    value = scores[self.you]
+            except SearchTimeout:
+                # Put back whatever the aborted search had applied
+                while len(state.history) > base:
+                    state.undo()
+                break
+
+            bestMove = move
+            self.depthReached = depth
+            self.completed.append((depth, move, value))
+
+            # Nothing was cut off by the depth limit, so searching deeper changes nothing
+            if not self.cutoff:
+                self.exact = True
+                break
+            depth += 1
+
+        self.elapsed = time.perf_counter() - started
+        return bestMove
 
-        for move in safeMoves:
-            # Simulate the move and evaluate
-            simulatedState = deepcopy(newState)
-            simulatedState.updateState(move, self.you.name)
-            scores = self.evaluateBoard(simulatedState)
-            
-            moveValue = scores[0] 
-            
-            if moveValue > bestValue:
-                bestValue = moveValue
-                bestMove = move
+    def searchJoints(self, joints):
+        """
+        Searches the position after each of these joint moves from the root, depth 1, 2,
+        3... until the deadline or maxDepth, for a root split across processes. Combining
+        the scores of every joint of the root as maxN or paranoid would gives the move the
+        search of the whole root picks.
 
-        return bestMove
+        Parameters:
+        - joints (List[Tuple[str]]): Joint moves from the root, aligned with state.snakes.
 
+        Returns:
+        - List[Tuple[int, Dict[Tuple[str], object]]]: The depth and the score of each joint
+        for every finished depth; our score with paranoid, the score vector with maxN.
+        """
+        started = time.perf_counter()
+        state = self.initial_state
+        base = len(state.history)
+
+        completed = []
+        self.nodes = 0
+        self.depthReached = 0
+        self.exact = False
+        self.table.nextAge()
+        depth = 1
+
+        while self.maxDepth is None or depth <= self.maxDepth:
+            if time.perf_counter() >= self.deadline:
+                break
+            self.cutoff = False
+            scores = {}
+            try:
+                for joint in joints:
+                    state.apply(joint)
+                    if self.mode == "paranoid":
+                        scores[joint], _ = self.paranoid(state, depth - 1, float("-inf"), float("inf"), ply=1)
+                    else:
+                        scores[joint], _ = self.maxN(state, depth - 1)
+                    state.undo()
+            except SearchTimeout:
+                while len(state.history) > base:
+                    state.undo()
+                break
+
+            self.depthReached = depth
+            completed.append((depth, scores))
+            if not self.cutoff:
+                self.exact = True
+                break
+            depth += 1
+
+        self.elapsed = time.perf_counter() - started
+        return completed
+
+    def maxN(self, state: State, depth, restrict=None):
+        """
+        Implements the Max-N algorithm over simultaneous moves to evaluate the best possible move
+        for each player in a game with N players, considering multiple adversaries.
 
+        Parameters:
+        - state (State object): The current game state. It is updated in place and restored.
+        - depth (int): The number of turns (plies of joint moves) to explore.
+        - restrict (Dict[int, List[str]]): Optional move options for some snakes, by index.
 
+        Returns:
+        - List[int]: A vector of evaluation scores for each player in the game, by snake index.
+        - Tuple[str]: The joint move chosen at this node, aligned with state.snakes.
 
-    def maxN(self, state: State, depth, playerIndex):
+        Every snake moves at once, so each node expands the cartesian product of the snakes'
+        safe moves and resolves collisions, food and health once per joint move. Each player
+        picks the move with the best average score for itself over the others' replies.
+        """
+        self.nodes += 1
+        if not self.nodes & 63 and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+        # Reuse a search of this position that went at least as deep; the root is
+        # skipped because its own moves are restricted to the safe ones
+        table = self.table
+        key, t = state.canonicalKey()
+        if restrict is None:
+            entry = table.get(key)
+            if entry is not None and entry[1] >= depth and entry[2] == EXACT:
+                if entry[1] < TERMINAL:
+                    self.cutoff = True
+                return entry[3], self.symmetry.unmapJoint(t, entry[4]) if t else entry[4]
+
+        if self.gameOver(state):
+            scores = self.evaluateBoard(state)
+            table.put(key, TERMINAL, EXACT, scores, ())
+            return scores, ()
+        if depth == 0:
+            self.cutoff = True
+            scores = self.evaluateBoard(state)
+            table.put(key, 0, EXACT, scores, ())
+            return scores, ()
+
+        snakes = state.snakes
+        options = state.jointMoves(restrict)
+
+        joints = list(product(*options))
+        if depth == 1 and self.batch and len(joints) >= BATCH_MIN_CHILDREN:
+            children = self.evaluateLeaves(state, joints)
+        else:
+            children = {}
+            for joint in joints:
+                state.apply(joint)
+                children[joint], _ = self.maxN(state, depth - 1)
+                state.undo()
+
+        # Total score each snake gets from each of its own moves
+        totals = [dict.fromkeys(moves, 0) for moves in options]
+        for joint, eval in children.items():
+            for i, snake in enumerate(snakes):
+                totals[i][joint[i]] += eval[snake.index]
+
+        # Every move of a snake meets the same number of replies, so totals rank like averages
+        choice = tuple(max(moves, key=moves.get) for moves in totals)
+        if restrict is None:
+            table.put(key, depth, EXACT, children[choice], self.symmetry.mapJoint(t, choice) if t else choice)
+        return children[choice], choice
+
+    def evaluateLeaves(self, state: State, joints):
         """
-        Implements the Max-N algorithm to evaluate the best possible move for each player in a game
-        with N players, considering multiple adversaries.
+        Plays each joint move from state and scores all of the resulting leaves together with
+        BatchEval, instead of calling evaluateBoard once per leaf. Leaves found in the
+        transposition table or where the game is over are handled one at a time as in maxN.
+
+        Returns:
+        - Dict[Tuple[str], List[int]]: The score vector of each joint move's leaf.
+        """
+        table = self.table
+        children = {}
+        pending = []
+        snapshots = []
+
+        for joint in joints:
+            self.nodes += 1
+            if not self.nodes & 63 and time.perf_counter() >= self.deadline:
+                raise SearchTimeout()
+
+            state.apply(joint)
+            key, _ = state.canonicalKey()
+            entry = table.get(key)
+            if entry is not None and entry[2] == EXACT:
+                if entry[1] < TERMINAL:
+                    self.cutoff = True
+                children[joint] = entry[3]
+            elif self.gameOver(state):
+                children[joint] = self.evaluateBoard(state)
+                table.put(key, TERMINAL, EXACT, children[joint], ())
+            else:
+                self.cutoff = True
+                pending.append((joint, key))
+                snapshots.append(BatchEval.snapshot(state))
+            state.undo()
+
+        if snapshots:
+            matrix = BatchEval.evaluateBatch(snapshots, state.grid, state.numPlayers, LOSS, self.weights)
+            for (joint, key), scores in zip(pending, matrix.tolist()):
+                children[joint] = scores
+                table.put(key, 0, EXACT, scores, ())
+        return children
+
+    def paranoid(self, state: State, depth, alpha, beta, restrict=None, ply=0):
+        """
+        Implements paranoid Minimax with Alpha-Beta pruning, where every opponent works
+        together to minimize our score.
 
         Parameters:
-        - state (State object): The current game state.
-        - depth (int): The depth of the game tree to explore.
-        - playerIndex (int): The index of the current player (0 to N-1).
+        - state (State object): The current game state. It is updated in place and restored.
+        - depth (int): The number of turns (plies of joint moves) to explore.
+        - alpha (int): The best score that we can guarantee at this level or above.
+        - beta (int): The best score that the opponents can guarantee at this level or above.
+        - restrict (Dict[int, List[str]]): Optional move options for some snakes, by index.
+        - ply (int): The number of turns between the root and this state.
 
         Returns:
-        - List[int]: A vector of evaluation scores for each player in the game.
-
-        This function recursively evaluates child states by simulating moves for all players until
-        the specified depth is reached or the game is over. Each player aims to maximize their own score.
-        """
-        numPlayers = len(state.snakes)
-        if depth == 0 or self.gameOver(state):
-            return self.evaluateBoard(state)
-
-        # Initialize a score list with worst possible scores for each player
-        scores = [
-            float("-inf") for i in range(numPlayers)
-        ]
-        print("SCORES", scores)
-        print(playerIndex)
-
-        for move in state.availableMoves:
-            newState = State(
-                state.board,
-                state.snakes,
-                state.height,
-                state.width,
-                state.numPlayers,
-                state.food,
-            )
-            newState.updateState(deepcopy(state), move)
-            nextPlayerIndex = (playerIndex + 1) % numPlayers
-            newDepth = depth - 1 if nextPlayerIndex == 0 else depth
-            eval = self.maxN(newState, newDepth, nextPlayerIndex)
-
-            # Update the score for the current player
-            scores[playerIndex] = max(scores[playerIndex], eval[playerIndex])
-            print("BEST SCORES2", scores)
-
-        print("BEST SCORES", scores)
-        return scores
+        - int: The evaluation score of the state for our snake.
+        - str: Our best move, or None at a leaf.
+
+        Each turn is split into our move followed by the opponents' joint reply to it, which
+        turns the simultaneous game into a two-sided tree that Alpha-Beta can prune.
+        """
+        self.nodes += 1
+        if not self.nodes & 63 and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+        table = self.table
+        key, t = state.canonicalKey()
+        key ^= PARANOID_KEY
+        entry = table.get(key) if restrict is None else None
+        ttMove = None
+        if entry is not None:
+            ttMove = self.symmetry.unmapMove(t, entry[4]) if t else entry[4]
+        if entry is not None and entry[1] >= depth:
+            value = entry[3]
+            if entry[2] == EXACT:
+                if entry[1] < TERMINAL:
+                    self.cutoff = True
+                return value, ttMove
+            elif entry[2] == LOWER:
+                alpha = max(alpha, value)
+            else:
+                beta = min(beta, value)
+            if alpha >= beta:
+                self.cutoff = True
+                return value, ttMove
+
+        snakes = state.snakes
+        ourIndex = next((i for i, snake in enumerate(snakes) if snake.index == self.you), None)
+        if ourIndex is None or self.gameOver(state):
+            value = self.evaluateBoard(state)[self.you]
+            table.put(key, TERMINAL, EXACT, value, None)
+            return value, None
+        if depth == 0:
+            self.cutoff = True
+            value = self.evaluateBoard(state)[self.you]
+            table.put(key, 0, EXACT, value, None)
+            return value, None
+
+        options = state.jointMoves(restrict)
+        ordering = self.ordering
+        if ordering is not None:
+            options = [
+                ordering.orderMoves(state, snake, moves, ply, ttMove if i == ourIndex else None)
+                if restrict is None or snake.index not in restrict else moves
+                for i, (snake, moves) in enumerate(zip(snakes, options))
+            ]
+        ourMoves = options.pop(ourIndex)
+        opponents = snakes[:ourIndex] + snakes[ourIndex + 1:]
+        alphaOrig = alpha
+        bestValue = float("-inf")
+        bestMove = None
+
+        for move in ourMoves:
+            # The opponents pick the joint reply that is worst for us
+            value = float("inf")
+            for reply in product(*options):
+                joint = reply[:ourIndex] + (move,) + reply[ourIndex:]
+                state.apply(joint)
+                eval, _ = self.paranoid(state, depth - 1, alpha, min(beta, value), ply=ply + 1)
+                state.undo()
+                value = min(value, eval)
+
+                # pruning
+                if value <= alpha:
+                    if ordering is not None:
+                        for snake, theirMove in zip(opponents, reply):
+                            ordering.recordCutoff(snake, theirMove, ply, depth)
+                    break
+
+            if value > bestValue:
+                bestValue = value
+                bestMove = move
+
+            # pruning
+            alpha = max(alpha, bestValue)
+            if beta <= alpha:
+                if ordering is not None:
+                    ordering.recordCutoff(snakes[ourIndex], move, ply, depth)
+                break
+
+        if bestValue <= alphaOrig:
+            bound = UPPER
+        elif bestValue >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        if restrict is None:
+            table.put(key, depth, bound, bestValue, self.symmetry.mapMove(t, bestMove) if t else bestMove)
+        return bestValue, bestMove
 
     def evaluateBoard(self, state):
-        scores = []
+        # Scores are indexed by snake index; eliminated snakes keep the LOSS score
+        scores = [LOSS] * state.numPlayers
+        distance = state.grid.distance
+        weights = self.weights
+        health, length, food_weight = weights["health"], weights["length"], weights["food"]
+
+        # Food cells, unpacked once from the bitmask
+        food_cells = []
+        food = state.food
+        while food:
+            low = food & -food
+            food_cells.append(low.bit_length() - 1)
+            food ^= low
+
+        # Cells each snake gets to first, and cells it ties for
+        reachable, contested = territory(state)
 
         for snake in state.snakes:
             score = 0
-            
+
             # Snek health points
-            score += snake.health
-            
+            score += snake.health * health
+
             # Snek length
-            score += snake.length * 2
-            
+            score += snake.length * length
+
+            # Sneks off the board are penalised heavily
+            if snake.head == OFF_BOARD:
+                scores[snake.index] = score + weights["offBoard"]
+                continue
+
             # Snek proximity to Food
+            head_distance = distance[snake.head]
             closest_food_distance = min(
-                abs(snake.head["x"] - food["x"]) + abs(snake.head["y"] - food["y"])
-                for food in state.food
-            ) if state.food else 100 
-            score -= closest_food_distance
-
-            # Proximity to other sneaky sneks
-            if (snake.head["x"] < 0 or snake.head["x"] >= state.width or
-                snake.head["y"] < 0 or snake.head["y"] >= state.height):
-                score -= 500
-            
-            scores.append(score)
-        
+                head_distance[cell] for cell in food_cells
+            ) if food_cells else 100
+            score -= closest_food_distance * food_weight
+
+            # Snek space
+            score += reachable[snake.index] * weights["reachable"] + contested[snake.index] * weights["contested"]
+
+            scores[snake.index] = score
+
         return scores
-    
+
     def gameOver(self, state):
-        return len(state.snakes) <=1
+        # A solo game goes on for as long as its only snake is alive
+        return len(state.snakes) < min(2, state.numPlayers)
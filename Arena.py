@@ -0,0 +1,343 @@
+# Plays games between snakes in process, without the server, and reports how often each
+# one wins.
+#
+#   python Arena.py [--players agent,greedy] [--games N] [--workers N] [--size 11]
+#                   [--move-time MS] [--seed 0] [--output FILE]
+#
+# Players are "agent" (main.move, with the engine set by SEARCH_ENGINE), the engines
+# "maxn", "paranoid" and "mcts" on their own, and the baseline bots "greedy" and "random".
+# The same player can be listed more than once for self-play. Seats are shuffled every
+# game, and the games run on a process pool.
+
+import argparse
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import main
+import Sessions
+from Agent import MARGIN_MS, AdversarialSearch, State
+from Grid import DELTAS
+from MCTS import MonteCarloSearch
+
+# Food rules of the standard ruleset: the board is topped up to MINIMUM_FOOD, and
+# otherwise gets one new food with this chance every turn
+MINIMUM_FOOD = 1
+FOOD_SPAWN_CHANCE = 0.15
+
+START_HEALTH = 100
+START_LENGTH = 3
+
+# Games still going after this many turns are draws
+MAX_TURNS = 1000
+
+# Normal quantile of the 95% confidence intervals
+Z_95 = 1.96
+
+
+class Simulator:
+    """
+    The standard ruleset, played on request dicts like the ones the server receives. Each
+    turn moves every snake, takes a point of health, feeds, spawns food and eliminates,
+    in that order.
+    """
+
+    def __init__(self, numSnakes, width=11, height=11, seed=0, timeout=500, gameId="arena"):
+        self.rng = random.Random(seed)
+        self.width = width
+        self.height = height
+        self.timeout = timeout
+        self.gameId = gameId
+        self.turn = 0
+
+        self.snakes = []
+        for i, (x, y) in enumerate(self.startPositions(numSnakes)):
+            self.snakes.append({
+                "id": f"snake-{i}",
+                "name": f"snake-{i}",
+                "health": START_HEALTH,
+                "body": [{"x": x, "y": y} for _ in range(START_LENGTH)],
+                "latency": "0",
+                "shout": "",
+            })
+        self.food = self.startFood()
+        # Turn on which each eliminated snake went out, by id
+        self.eliminated = {}
+
+    def startPositions(self, numSnakes):
+        """Corners first, then the middle of each edge, one cell in from the walls."""
+        low, high = 1, self.width - 2
+        middleX, middleY = (self.width - 1) // 2, (self.height - 1) // 2
+        top = self.height - 2
+        corners = [(low, low), (low, top), (high, low), (high, top)]
+        edges = [(low, middleY), (middleX, low), (middleX, top), (high, middleY)]
+        self.rng.shuffle(corners)
+        self.rng.shuffle(edges)
+        positions = corners + edges
+        if numSnakes > len(positions):
+            raise ValueError(f"at most {len(positions)} snakes can start on the board")
+        return positions[:numSnakes]
+
+    def startFood(self):
+        """One food diagonally next to each snake, on the side away from the centre, and one in the centre."""
+        centre = ((self.width - 1) // 2, (self.height - 1) // 2)
+        food = {centre}
+        for snake in self.snakes:
+            x, y = snake["body"][0]["x"], snake["body"][0]["y"]
+            options = [
+                (x + dx, y + dy) for dx in (-1, 1) for dy in (-1, 1)
+                if 0 <= x + dx < self.width and 0 <= y + dy < self.height
+                and abs(x + dx - centre[0]) + abs(y + dy - centre[1]) >= abs(x - centre[0]) + abs(y - centre[1])
+            ]
+            options = [point for point in options if point not in food]
+            if options:
+                food.add(self.rng.choice(options))
+        return [{"x": x, "y": y} for x, y in sorted(food)]
+
+    def request(self, snake):
+        """The move request the server would get for one snake."""
+        snakes = [dict(other, head=other["body"][0], length=len(other["body"])) for other in self.snakes]
+        return {
+            "game": {"id": self.gameId, "ruleset": {"name": "standard"}, "timeout": self.timeout},
+            "turn": self.turn,
+            "board": {"width": self.width, "height": self.height, "food": list(self.food), "hazards": [], "snakes": snakes},
+            "you": next(other for other in snakes if other["id"] == snake["id"]),
+        }
+
+    def over(self):
+        return len(self.snakes) <= (0 if len(self.snakes) + len(self.eliminated) == 1 else 1)
+
+    def step(self, moves):
+        """Plays one turn from every snake's move, by id."""
+        for snake in self.snakes:
+            dx, dy = DELTAS[moves.get(snake["id"], "up")]
+            head = snake["body"][0]
+            snake["body"].insert(0, {"x": head["x"] + dx, "y": head["y"] + dy})
+            snake["body"].pop()
+            snake["health"] -= 1
+
+        # Every snake whose head reaches a food eats it
+        eaten = set()
+        for snake in self.snakes:
+            head = (snake["body"][0]["x"], snake["body"][0]["y"])
+            if any(head == (food["x"], food["y"]) for food in self.food):
+                eaten.add(head)
+                snake["health"] = START_HEALTH
+                snake["body"].append(dict(snake["body"][-1]))
+        self.food = [food for food in self.food if (food["x"], food["y"]) not in eaten]
+        self.spawnFood()
+
+        # Starved and out of bounds first, then collisions between the snakes still in
+        out = set()
+        for snake in self.snakes:
+            head = snake["body"][0]
+            if snake["health"] <= 0 or not (0 <= head["x"] < self.width and 0 <= head["y"] < self.height):
+                out.add(snake["id"])
+        standing = [snake for snake in self.snakes if snake["id"] not in out]
+        bodies = {(point["x"], point["y"]) for snake in standing for point in snake["body"][1:]}
+        collided = set()
+        for snake in standing:
+            head = (snake["body"][0]["x"], snake["body"][0]["y"])
+            if head in bodies:
+                collided.add(snake["id"])
+            for other in standing:
+                if other is not snake and head == (other["body"][0]["x"], other["body"][0]["y"]):
+                    if len(snake["body"]) <= len(other["body"]):
+                        collided.add(snake["id"])
+
+        self.turn += 1
+        for snakeId in out | collided:
+            self.eliminated[snakeId] = self.turn
+        self.snakes = [snake for snake in self.snakes if snake["id"] not in self.eliminated]
+
+    def spawnFood(self):
+        taken = {(point["x"], point["y"]) for snake in self.snakes for point in snake["body"]}
+        taken.update((food["x"], food["y"]) for food in self.food)
+        free = [(x, y) for x in range(self.width) for y in range(self.height) if (x, y) not in taken]
+        count = max(MINIMUM_FOOD - len(self.food), 0)
+        if count == 0 and self.rng.random() < FOOD_SPAWN_CHANCE:
+            count = 1
+        for x, y in self.rng.sample(free, min(count, len(free))):
+            self.food.append({"x": x, "y": y})
+
+
+def safeMoves(game_state):
+    state = State.fromRequest(game_state)
+    you = next(snake for snake in state.snakes if snake.id == game_state["you"]["id"])
+    return state, state.snakeMoves(you, state.blockedCells())
+
+
+def searchPlayer(engine, weights=None):
+    """
+    Handlers of a snake that only runs one search engine, without main.move's food rule,
+    evaluating with the given weights or else the engine's own.
+    """
+
+    def move(game_state):
+        state, moves = safeMoves(game_state)
+        if not moves:
+            return {"move": "down"}
+        session = Sessions.session(game_state)
+        if engine == "mcts":
+            agent = MonteCarloSearch(game_state, session=session, state=state, weights=weights)
+        else:
+            agent = AdversarialSearch(game_state, session=session, state=state, mode=engine, weights=weights)
+        return {"move": agent.findOptimalMove(moves)}
+
+    return {"start": Sessions.create, "move": move, "end": Sessions.close}
+
+
+def randomMove(game_state):
+    moves = safeMoves(game_state)[1]
+    return {"move": random.choice(moves) if moves else "down"}
+
+
+def greedyMove(game_state):
+    """Heads for the nearest food by a safe move, picking at random between equally good ones."""
+    state, moves = safeMoves(game_state)
+    if not moves:
+        return {"move": "down"}
+    grid = state.grid
+    head = grid.cellIndex(game_state["you"]["body"][0])
+    foods = [grid.cellIndex(food) for food in game_state["board"]["food"]]
+    if not foods:
+        return {"move": random.choice(moves)}
+    distance = {move: min(grid.distance[grid.step[move][head]][food] for food in foods) for move in moves}
+    best = min(distance.values())
+    return {"move": random.choice([move for move in moves if distance[move] == best])}
+
+
+def ignore(game_state):
+    pass
+
+
+def players(weights=None):
+    return {
+        "agent": {"start": main.start, "move": main.move, "end": main.end},
+        "maxn": searchPlayer("maxn", weights),
+        "paranoid": searchPlayer("paranoid", weights),
+        "mcts": searchPlayer("mcts", weights),
+        "greedy": {"start": ignore, "move": greedyMove, "end": ignore},
+        "random": {"start": ignore, "move": randomMove, "end": ignore},
+    }
+
+
+def playGame(seed, names, width=11, height=11, moveTime=100, weights=None):
+    """
+    Plays one game with the players seated in a shuffled order and returns the winner's
+    position in names (None for a draw), the number of turns and every move's latency in
+    milliseconds by position in names. weights optionally gives the evaluation weights of
+    the search players, by position in names.
+    """
+    random.seed(seed)
+    handlers = [players(weights[i] if weights else None)[name] for i, name in enumerate(names)]
+    seats = list(range(len(names)))
+    random.Random(seed).shuffle(seats)
+
+    # The searches stop MARGIN_MS before the timeout, so this leaves them moveTime
+    sim = Simulator(len(names), width, height, seed, moveTime + MARGIN_MS, f"arena-{seed}")
+    seated = {sim.snakes[seat]["id"]: position for seat, position in enumerate(seats)}
+    latencies = [[] for _ in names]
+
+    for snake in sim.snakes:
+        handlers[seated[snake["id"]]]["start"](sim.request(snake))
+    requests = {}
+    while not sim.over() and sim.turn < MAX_TURNS:
+        moves = {}
+        for snake in sim.snakes:
+            position = seated[snake["id"]]
+            request = requests[snake["id"]] = sim.request(snake)
+            started = time.perf_counter()
+            moves[snake["id"]] = handlers[position]["move"](request)["move"]
+            latencies[position].append((time.perf_counter() - started) * 1000)
+        sim.step(moves)
+    for snakeId, request in requests.items():
+        handlers[seated[snakeId]]["end"](request)
+
+    winner = None
+    if len(sim.snakes) == 1 and len(names) > 1:
+        winner = seated[sim.snakes[0]["id"]]
+    return {"winner": winner, "turns": sim.turn, "latencies": latencies}
+
+
+def wilson(wins, games, z=Z_95):
+    """Wilson score interval of a win rate."""
+    if games == 0:
+        return 0.0, 0.0
+    rate = wins / games
+    centre = rate + z * z / (2 * games)
+    spread = z * math.sqrt(rate * (1 - rate) / games + z * z / (4 * games * games))
+    scale = 1 + z * z / games
+    return (centre - spread) / scale, (centre + spread) / scale
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+
+def runArena(names, games, workers=None, width=11, height=11, moveTime=100, seed=0):
+    """Plays the games on a process pool and returns the win rate and latency of each player."""
+    labels = [name if names.index(name) == i else f"{name}#{i + 1}" for i, name in enumerate(names)]
+    wins = [0] * len(names)
+    latencies = [[] for _ in names]
+    draws = 0
+    turns = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            playGame,
+            range(seed, seed + games),
+            [names] * games,
+            [width] * games,
+            [height] * games,
+            [moveTime] * games,
+            chunksize=max(1, games // (4 * (workers or os.cpu_count() or 1))),
+        )
+        for result in results:
+            turns += result["turns"]
+            if result["winner"] is None:
+                draws += 1
+            else:
+                wins[result["winner"]] += 1
+            for position, values in enumerate(result["latencies"]):
+                latencies[position].extend(values)
+
+    summary = []
+    for position, label in enumerate(labels):
+        low, high = wilson(wins[position], games)
+        summary.append({
+            "player": label,
+            "wins": wins[position],
+            "winRate": round(wins[position] / games, 4),
+            "ci95": [round(low, 4), round(high, 4)],
+            "latencyMs": {
+                "p50": round(percentile(latencies[position], 0.5), 2),
+                "p99": round(percentile(latencies[position], 0.99), 2),
+                "max": round(max(latencies[position], default=0.0), 2),
+            },
+        })
+    return {"games": games, "draws": draws, "avgTurns": round(turns / games, 1), "players": summary}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", default="agent,greedy", help="comma-separated players, one per snake")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="processes to play on (default: all cores)")
+    parser.add_argument("--size", type=int, default=11, help="board width and height")
+    parser.add_argument("--move-time", type=int, default=100, help="search time per move in ms")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--output", help="file to write the results to instead of stdout")
+    args = parser.parse_args()
+
+    report = runArena(args.players.split(","), args.games, args.workers, args.size, args.size, args.move_time, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,144 @@
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; without it leaves are scored one at a time
+    np = None
+
+# Distance tables of each Grid as NumPy arrays
+_distances = {}
+
+
+def available():
+    return np is not None
+
+
+def snapshot(state):
+    """
+    Reads the parts of a state that evaluateBatch needs, so the state itself can be undone
+    before the batch is scored.
+    """
+    return state.food, [
+        (snake.index, snake.head, snake.health, snake.length, list(snake.segments()))
+        for snake in state.snakes
+    ]
+
+
+def cellDistances(grid):
+    distances = _distances.get(grid)
+    if distances is None:
+        distances = _distances[grid] = np.array(grid.distance, dtype=np.int64)
+    return distances
+
+
+def evaluateBatch(snapshots, grid, numPlayers, loss, weights):
+    """
+    Scores K states at once with the same terms as AdversarialSearch.evaluateBoard: health,
+    length, distance to the nearest food and flood-fill territory. Snakes that are no longer
+    on the board, including any that hit a wall, get the loss score.
+
+    Parameters:
+    - snapshots (List): K results of snapshot(), all taken on the same board.
+    - grid (Grid object): The board the states are on; its edges must not wrap.
+    - numPlayers (int): The number of snakes the game started with.
+    - loss (int): The score of an eliminated snake.
+    - weights (Dict[str, float]): The weight of each term, as in Weights.DEFAULT_WEIGHTS.
+
+    Returns:
+    - numpy.ndarray: A K x numPlayers matrix of scores, by snake index.
+    """
+    K = len(snapshots)
+    width, height, cells = grid.width, grid.height, grid.cells
+    nbytes = (cells + 7) // 8
+
+    # Every body cell stays blocked until the turn its segment has left, counted from the tail
+    states, indices, headCells, healths, lengths = [], [], [], [], []
+    rows, cols, turns = [], [], []
+    foodBytes = bytearray()
+    for k, (food, snakes) in enumerate(snapshots):
+        foodBytes += food.to_bytes(nbytes, "little")
+        for index, head, hp, size, segments in snakes:
+            states.append(k)
+            indices.append(index)
+            headCells.append(head)
+            healths.append(hp)
+            lengths.append(size)
+            n = len(segments)
+            rows.extend([k] * n)
+            cols.extend(segments)
+            turns.extend(range(n, 0, -1))
+
+    alive = np.zeros((K, numPlayers), dtype=bool)
+    heads = np.zeros((K, numPlayers), dtype=np.intp)
+    health = np.zeros((K, numPlayers), dtype=np.int64)
+    length = np.zeros((K, numPlayers), dtype=np.int64)
+    ks = np.array(states, dtype=np.intp)
+    ns = np.array(indices, dtype=np.intp)
+    alive[ks, ns] = True
+    heads[ks, ns] = headCells
+    health[ks, ns] = healths
+    length[ks, ns] = lengths
+
+    food = np.unpackbits(
+        np.frombuffer(bytes(foodBytes), dtype=np.uint8).reshape(K, nbytes), axis=1, bitorder="little"
+    )[:, :cells].astype(bool)
+
+    # Each board row is packed into the bits of one integer, so a search step for every
+    # snake of every state is a handful of shifts over a K x N x height array
+    bits = np.uint64(1) << np.arange(width, dtype=np.uint64)
+    rowMask = np.uint64((1 << width) - 1)
+    one = np.uint64(1)
+
+    # Stacked segments share a cell, which is freed by the last of them to leave
+    freeAt = np.zeros((K, cells), dtype=np.intp)
+    np.maximum.at(freeAt, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), np.array(turns, dtype=np.intp))
+    bodyStates, bodyCells = np.nonzero(freeAt)
+    lastFree = int(freeAt.max()) if rows else 0
+    released = np.zeros((lastFree + 1, K, height), dtype=np.uint64)
+    np.bitwise_or.at(
+        released,
+        (freeAt[bodyStates, bodyCells], bodyStates, bodyCells // width),
+        bits[bodyCells % width],
+    )
+    blocked = np.bitwise_or.reduce(released, axis=0)
+
+    fronts = np.zeros((K, numPlayers, height), dtype=np.uint64)
+    fronts[ks, ns, heads[ks, ns] // width] = bits[heads[ks, ns] % width]
+    claimed = np.bitwise_or.reduce(fronts, axis=1)
+    won = np.zeros((K, numPlayers), dtype=np.int64)
+    tied = np.zeros((K, numPlayers), dtype=np.int64)
+
+    # Multi-source breadth-first search from every head of every state at once
+    turn = 0
+    while True:
+        turn += 1
+        if turn <= lastFree:
+            blocked &= ~released[turn]
+        free = ~(claimed | blocked) & rowMask
+
+        grown = (fronts << one) | (fronts >> one)
+        grown[:, :, 1:] |= fronts[:, :, :-1]
+        grown[:, :, :-1] |= fronts[:, :, 1:]
+        grown &= free[:, None]
+
+        seen = np.zeros_like(claimed)
+        shared = np.zeros_like(claimed)
+        for n in range(numPlayers):
+            shared |= seen & grown[:, n]
+            seen |= grown[:, n]
+        if not seen.any():
+            break
+        shared = shared[:, None]
+        fronts = grown & ~shared
+        won += np.bitwise_count(fronts).sum(axis=2, dtype=np.int64)
+        tied += np.bitwise_count(grown & shared).sum(axis=2, dtype=np.int64)
+        claimed |= seen
+
+    # Distance from each head to its nearest food, or 100 on a board without food
+    distances = cellDistances(grid)[heads]
+    nearest = np.where(food[:, None, :], distances, cells).min(axis=2)
+    nearest = np.where(food.any(axis=1)[:, None], nearest, 100)
+
+    scores = (
+        health * weights["health"] + length * weights["length"] - nearest * weights["food"]
+        + won * weights["reachable"] + tied * weights["contested"]
+    )
+    return np.where(alive, scores, loss)
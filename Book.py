@@ -0,0 +1,141 @@
+import hashlib
+import mmap
+import os
+import struct
+
+from Grid import DIRECTIONS
+from Symmetry import Symmetry
+
+# Opening book written by BookBuilder.py; an empty value or a missing file turns it off
+BOOK_FILE = os.environ.get("OPENING_BOOK", os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin"))
+
+MAGIC = b"BSBK"
+VERSION = 1
+
+# Magic, version, number of slots (a power of two) and the last turn with an entry
+_header = struct.Struct("<4sBII")
+_slot = struct.Struct("<Q")
+
+# Each slot is a position key with its low bits replaced by the book move; 0 marks an empty slot
+MOVE_BITS = 2
+MOVE_MASK = (1 << MOVE_BITS) - 1
+
+
+def positionKey(state, you, t=0):
+    """
+    A 64-bit key of the position as our snake sees it, after symmetry transform t: the
+    board size, the food, our snake, then the other snakes in a fixed order, so the key
+    does not depend on snake ids or their order in the request.
+    """
+    width, height = state.width, state.height
+    mapped = Symmetry.forBoard(width, height).cells[t]
+    food = state.food
+    cells = []
+    while food:
+        low = food & -food
+        cells.append(mapped[low.bit_length() - 1])
+        food ^= low
+
+    ours = None
+    others = []
+    for snake in state.snakes:
+        body = tuple(mapped[cell] for cell in snake.segments())
+        entry = (snake.health, body)
+        if snake.index == you:
+            ours = entry
+        else:
+            others.append(entry)
+    text = repr((width, height, sorted(cells), ours, sorted(others)))
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+
+def canonicalKey(state, you):
+    """Returns the smallest key of the position over every symmetry of the board, and the transform giving it."""
+    return Symmetry.forBoard(state.width, state.height).canonical(lambda t: positionKey(state, you, t))
+
+
+def _slotKey(key):
+    # Keys lose their move bits, and never become the empty slot
+    return (key & ~MOVE_MASK) or (1 << MOVE_BITS)
+
+
+def write(entries, path=BOOK_FILE, maxTurn=0):
+    """
+    Writes a book of {canonical key: canonical move} as an open-addressing hash table at
+    most half full, replacing the old file only once the new one is complete.
+    """
+    slots = 1
+    while slots < 2 * max(len(entries), 1):
+        slots *= 2
+    table = [0] * slots
+    for key, move in entries.items():
+        stored = _slotKey(key)
+        index = (stored >> MOVE_BITS) & (slots - 1)
+        while table[index] and table[index] & ~MOVE_MASK != stored:
+            index = (index + 1) & (slots - 1)
+        table[index] = stored | DIRECTIONS.index(move)
+
+    partial = path + ".tmp"
+    with open(partial, "wb") as output:
+        output.write(_header.pack(MAGIC, VERSION, slots, maxTurn))
+        output.write(struct.pack(f"<{slots}Q", *table))
+    os.replace(partial, path)
+
+
+class OpeningBook:
+    """
+    Book moves read from a memory-mapped hash table of canonical position keys, so that a
+    lookup costs a few probes whatever the size of the book, and the file is shared by
+    every process that maps it.
+    """
+
+    def __init__(self, path=BOOK_FILE):
+        with open(path, "rb") as handle:
+            self.data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.slots, self.maxTurn = _header.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError(f"{path} is not a version {VERSION} opening book")
+        self.mask = self.slots - 1
+
+    def __len__(self):
+        return sum(1 for index in range(self.slots) if self.slot(index))
+
+    def close(self):
+        self.data.close()
+
+    def slot(self, index):
+        return _slot.unpack_from(self.data, _header.size + index * _slot.size)[0]
+
+    def get(self, key):
+        """Returns the move stored for a canonical key, or None."""
+        stored = _slotKey(key)
+        index = (stored >> MOVE_BITS) & self.mask
+        while True:
+            value = self.slot(index)
+            if not value:
+                return None
+            if value & ~MOVE_MASK == stored:
+                return DIRECTIONS[value & MOVE_MASK]
+            index = (index + 1) & self.mask
+
+    def lookup(self, state, you, turn):
+        """Returns the book move of our snake in this position, or None if it is not in the book."""
+        if turn > self.maxTurn:
+            return None
+        key, t = canonicalKey(state, you)
+        return Symmetry.forBoard(state.width, state.height).unmapMove(t, self.get(key))
+
+
+_book = None
+_loaded = False
+
+
+def book(path=BOOK_FILE):
+    """The opening book of this process, opened on first use; None when there is no book file."""
+    global _book, _loaded
+    if not _loaded:
+        _loaded = True
+        if path and os.path.exists(path):
+            _book = OpeningBook(path)
+    return _book
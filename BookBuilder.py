@@ -0,0 +1,174 @@
+# Builds the opening book that main.move looks up before it searches.
+#
+#   python BookBuilder.py [--snakes 2] [--turns 2] [--time MS] [--depth N]
+#                         [--workers N] [--output book.bin]
+#
+# The standard ruleset starts snakes on fixed spawn points (all in corners or all in the
+# middles of the edges, one cell in from the walls) with one food diagonally next to each,
+# away from the centre, and one food in the centre. Every such start is searched for every
+# seat, well past what a single turn allows, and so is every position our book move and
+# each reply of the opponents lead to, up to --turns turns. Symmetric positions share one
+# entry, and only their canonical orientation is searched.
+
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, product
+
+import Book
+from Agent import AdversarialSearch, State
+from Arena import START_HEALTH, START_LENGTH
+from Symmetry import Symmetry
+
+
+def spawnPoints(width, height):
+    """The corner and edge spawn points of the standard ruleset."""
+    low, high = 1, width - 2
+    top = height - 2
+    middleX, middleY = (width - 1) // 2, (height - 1) // 2
+    corners = [(low, low), (low, top), (high, low), (high, top)]
+    edges = [(low, middleY), (middleX, low), (middleX, top), (high, middleY)]
+    return corners, edges
+
+
+def foodOptions(head, width, height):
+    """Cells diagonal to a spawn point that are no closer to the centre than it is."""
+    x, y = head
+    centre = ((width - 1) // 2, (height - 1) // 2)
+    return [
+        (x + dx, y + dy) for dx in (-1, 1) for dy in (-1, 1)
+        if 0 <= x + dx < width and 0 <= y + dy < height
+        and abs(x + dx - centre[0]) + abs(y + dy - centre[1]) >= abs(x - centre[0]) + abs(y - centre[1])
+    ]
+
+
+def startRequests(numSnakes, width=11, height=11):
+    """Yields the turn 0 request of every standard start for numSnakes, seen by snake-0."""
+    corners, edges = spawnPoints(width, height)
+    centre = ((width - 1) // 2, (height - 1) // 2)
+    for points in (corners, edges):
+        for heads in combinations(points, numSnakes):
+            for foods in product(*(foodOptions(head, width, height) for head in heads)):
+                if len(set(foods) | {centre}) != numSnakes + 1:
+                    continue
+                snakes = [
+                    {
+                        "id": f"snake-{i}",
+                        "name": f"snake-{i}",
+                        "health": START_HEALTH,
+                        "body": [{"x": x, "y": y} for _ in range(START_LENGTH)],
+                    }
+                    for i, (x, y) in enumerate(heads)
+                ]
+                for snake in snakes:
+                    snake["head"] = snake["body"][0]
+                    snake["length"] = START_LENGTH
+                food = [{"x": x, "y": y} for x, y in sorted(set(foods) | {centre})]
+                yield {
+                    "game": {"id": "book", "ruleset": {"name": "standard"}, "timeout": 500},
+                    "turn": 0,
+                    "board": {"width": width, "height": height, "food": food, "hazards": [], "snakes": snakes},
+                    "you": snakes[0],
+                }
+
+
+def replay(request, history):
+    """Builds the state reached from request by playing the joint moves in history."""
+    state = State.fromRequest(request)
+    for joint in history:
+        state.apply(joint)
+    state.history = []
+    return state
+
+
+def searchPosition(request, you, history, moveTime, depth):
+    """Searches one book position and returns our best move, or None if we have no safe move."""
+    state = replay(request, history)
+    snake = next((snake for snake in state.snakes if snake.index == you), None)
+    if snake is None or len(state.snakes) < 2:
+        return None
+    safeMoves = state.snakeMoves(snake, state.blockedCells())
+    if not safeMoves:
+        return None
+    game = {"game": {"timeout": moveTime}, "you": {"id": snake.id}}
+    agent = AdversarialSearch(game, maxDepth=depth, margin=0, state=state)
+    return agent.findOptimalMove(safeMoves)
+
+
+def build(snakeCounts, turns, moveTime, depth=None, workers=None, width=11, height=11):
+    """
+    Searches every book position and returns {canonical key: canonical move}.
+
+    Parameters:
+    - snakeCounts (List[int]): Numbers of snakes whose starts go in the book.
+    - turns (int): Turns of every game covered, from turn 0.
+    - moveTime (int): Search time per position in milliseconds.
+    - depth (int): Search depth limit, or None to search for the whole moveTime.
+    - workers (int): Processes to search on, or None for all cores.
+
+    Returns:
+    - Dict[int, str]: The book move of every position, in its canonical orientation.
+    """
+    entries = {}
+    # (request, our snake index, joint moves played since turn 0) of each position to search
+    frontier = []
+    for numSnakes in snakeCounts:
+        for request in startRequests(numSnakes, width, height):
+            for you in range(numSnakes):
+                frontier.append((request, you, ()))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for turn in range(turns):
+            # Positions that are symmetric to one already queued are searched once
+            unique = {}
+            for request, you, history in frontier:
+                state = replay(request, history)
+                key, t = Book.canonicalKey(state, you)
+                if key not in entries and key not in unique:
+                    unique[key] = (request, you, history, t)
+            started = time.perf_counter()
+            positions = list(unique.values())
+            moves = executor.map(
+                searchPosition,
+                [position[0] for position in positions],
+                [position[1] for position in positions],
+                [position[2] for position in positions],
+                [moveTime] * len(positions),
+                [depth] * len(positions),
+            )
+
+            frontier = []
+            for (key, (request, you, history, t)), move in zip(unique.items(), moves):
+                if move is None:
+                    continue
+                entries[key] = Symmetry.forBoard(width, height).mapMove(t, move)
+                # Every reply of the opponents to our book move leads to a position of the next turn
+                state = replay(request, history)
+                blocked = state.blockedCells()
+                options = [
+                    [move] if snake.index == you else state.snakeMoves(snake, blocked) or ["up"]
+                    for snake in state.snakes
+                ]
+                for joint in product(*options):
+                    frontier.append((request, you, history + (joint,)))
+            print(json.dumps({"turn": turn, "positions": len(positions), "entries": len(entries), "seconds": round(time.perf_counter() - started, 1)}))
+    return entries
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--snakes", default="2", help="comma-separated snake counts whose starts go in the book")
+    parser.add_argument("--turns", type=int, default=2, help="turns covered from the start")
+    parser.add_argument("--time", type=int, default=5000, help="search time per position in ms")
+    parser.add_argument("--depth", type=int, default=None, help="search depth limit (default: the whole time)")
+    parser.add_argument("--workers", type=int, default=None, help="processes to search on (default: all cores)")
+    parser.add_argument("--size", type=int, default=11, help="board width and height")
+    parser.add_argument("--output", default=Book.BOOK_FILE, help="book file to write")
+    args = parser.parse_args()
+
+    snakeCounts = [int(count) for count in args.snakes.split(",")]
+    if not all(2 <= count <= 4 for count in snakeCounts):
+        parser.error("the book covers starts of 2 to 4 snakes")
+    entries = build(snakeCounts, args.turns, args.time, args.depth, args.workers, args.size, args.size)
+    Book.write(entries, args.output, maxTurn=args.turns - 1)
@@ -0,0 +1,148 @@
+import os
+import time
+
+from Agent import SearchTimeout
+from Grid import DIRECTIONS
+from Territory import territory
+
+# 1v1 positions are solved once the two snakes reach at most this many free cells between them
+ENDGAME_CELLS = int(os.environ.get("ENDGAME_CELLS", "24"))
+
+# Time the solver may take before the move goes to the search, in milliseconds
+ENDGAME_MS = int(os.environ.get("ENDGAME_MS", "100"))
+
+# Score of a won game seen from the position it is won from, less one per turn it takes
+WIN = 10000
+
+
+def isEndgame(state):
+    """True for a 1v1 position where the snakes have few enough free cells left to solve."""
+    if len(state.snakes) != 2:
+        return False
+    reachable, contested = territory(state)
+    return sum(reachable) + sum(contested) <= ENDGAME_CELLS
+
+
+class EndgameSolver:
+    """
+    Looks for a forced win in a small 1v1 endgame by searching every line to the end of
+    the game, deepening one turn at a time. Only wins, losses and draws are scored: no
+    evaluation is involved, so a win it finds is exact under the standard rules, apart
+    from food that spawns at random later on.
+
+    Our move is searched before the opponent's, which lets the opponent answer a move it
+    would not see in a real game; a win against that opponent is a win against any.
+    """
+
+    def __init__(self, state, you, budget=ENDGAME_MS, deadline=None):
+        # budget milliseconds from now, but never past deadline (a perf_counter time) when
+        # given, such as the move deadline of the search that runs if no win is found
+        self.deadline = time.perf_counter() + budget / 1000
+        if deadline is not None:
+            self.deadline = min(self.deadline, deadline)
+        self.state = state
+        self.you = you
+        # (position, depth) -> value of the wins and losses already proven
+        self.table = {}
+        self.nodes = 0
+        self.depthReached = 0
+
+    def solve(self, safeMoves):
+        """Returns the quickest forced win from safeMoves, or None if there is none or no time to find it."""
+        state = self.state
+        base = len(state.history)
+        depth = 1
+        while time.perf_counter() < self.deadline:
+            self.cutoff = False
+            try:
+                value, move = self.search(state, depth, -WIN, WIN, safeMoves)
+            except SearchTimeout:
+                while len(state.history) > base:
+                    state.undo()
+                return None
+            self.depthReached = depth
+            if value > 0:
+                return move
+            # Every line ended before the horizon, so there is no win to find deeper
+            if not self.cutoff:
+                return None
+            depth += 1
+        return None
+
+    def key(self, state):
+        # Whole bodies rather than the Zobrist hash: equal cell sets in a different order
+        # lead to different games once the tails move
+        return (state.food, tuple((snake.index, snake.health, tuple(snake.segments())) for snake in state.snakes))
+
+    def outcome(self, state):
+        """The score of a finished game for us, or None while both snakes are alive."""
+        alive = [snake.index for snake in state.snakes]
+        if self.you not in alive:
+            return -WIN if alive else 0
+        if len(alive) == 1:
+            return WIN
+        return None
+
+    def search(self, state, depth, alpha, beta, restrict=None):
+        """
+        Alpha-beta over our move and then the opponent's reply, to depth turns.
+
+        Returns:
+        - int: WIN - n for a win in n turns, -(WIN - n) for a loss in n turns, and 0 for a
+        draw or a game still going at the horizon.
+        - str: Our best move, or None once the game is over.
+        """
+        self.nodes += 1
+        if not self.nodes & 63 and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+        value = self.outcome(state)
+        if value is not None:
+            return value, None
+        if depth == 0:
+            self.cutoff = True
+            return 0, None
+
+        key = self.key(state) if restrict is None else None
+        if key is not None:
+            entry = self.table.get((key, depth))
+            # Only proven results are stored, which no window changes
+            if entry is not None:
+                return entry, None
+
+        blocked = state.blockedCells()
+        snakes = state.snakes
+        options = [
+            (restrict if restrict is not None and snake.index == self.you else state.snakeMoves(snake, blocked)) or [DIRECTIONS[0]]
+            for snake in snakes
+        ]
+        ourIndex = next(i for i, snake in enumerate(snakes) if snake.index == self.you)
+        ourMoves = options[ourIndex]
+        replies = options[1 - ourIndex]
+
+        alphaOrig = alpha
+        bestValue = -WIN - 1
+        bestMove = ourMoves[0]
+        for move in ourMoves:
+            value = WIN + 1
+            for reply in replies:
+                joint = (move, reply) if ourIndex == 0 else (reply, move)
+                # The child scores from one turn later, so its window is one wider
+                state.apply(joint)
+                eval, _ = self.search(state, depth - 1, alpha - 1, min(beta, value) + 1)
+                state.undo()
+                eval -= (eval > 0) - (eval < 0)
+                value = min(value, eval)
+                if value <= alpha:
+                    break
+            if value > bestValue:
+                bestValue = value
+                bestMove = move
+            alpha = max(alpha, bestValue)
+            if beta <= alpha:
+                break
+
+        # Wins and losses inside the window are exact; a draw may be a line cut at the horizon
+        if key is not None and alphaOrig < bestValue < beta and bestValue != 0:
+            self.table[(key, depth)] = bestValue
+        return bestValue, bestMove
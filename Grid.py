@@ -0,0 +1,90 @@
+# Move names in the order they are generated
+DIRECTIONS = ("up", "down", "left", "right")
+
+# Cell reached by moving off the board
+OFF_BOARD = -1
+
+# Change in (x, y) for each move
+DELTAS = {"up": (0, 1), "down": (0, -1), "left": (-1, 0), "right": (1, 0)}
+
+_grids = {}
+
+
+class Grid:
+    """
+    Lookup tables for one board size and ruleset, built once and shared by every state on
+    that board. Cells are indexed as y * width + x.
+
+    - step[direction][cell]: the cell a move leads to, or OFF_BOARD.
+    - neighbors[cell]: (direction, cell) pairs for every move that stays on the board.
+    - distance[a][b]: the number of moves between two cells on an empty board.
+    - coords[cell]: the (x, y) of a cell.
+    """
+
+    def __init__(self, width, height, ruleset="standard"):
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        # In the wrapped ruleset, moving off one edge comes back in on the opposite edge
+        self.wrapped = ruleset == "wrapped"
+
+        self.coords = tuple((cell % width, cell // width) for cell in range(self.cells))
+
+        self.step = {}
+        for direction, (dx, dy) in DELTAS.items():
+            targets = []
+            for x, y in self.coords:
+                x, y = x + dx, y + dy
+                if self.wrapped:
+                    x, y = x % width, y % height
+                targets.append(y * width + x if 0 <= x < width and 0 <= y < height else OFF_BOARD)
+            self.step[direction] = tuple(targets)
+
+        self.neighbors = tuple(
+            tuple((direction, self.step[direction][cell]) for direction in DIRECTIONS if self.step[direction][cell] != OFF_BOARD)
+            for cell in range(self.cells)
+        )
+
+        def span(a, b, size):
+            d = abs(a - b)
+            return min(d, size - d) if self.wrapped else d
+
+        self.distance = tuple(
+            tuple(span(ax, bx, width) + span(ay, by, height) for bx, by in self.coords)
+            for ax, ay in self.coords
+        )
+
+        # Bitmasks of every cell, and of every cell off the left or right column
+        self.full = (1 << self.cells) - 1
+        leftColumn = 0
+        for y in range(height):
+            leftColumn |= 1 << (y * width)
+        self.notLeft = self.full & ~leftColumn
+        self.notRight = self.full & ~(leftColumn << (width - 1))
+
+    @classmethod
+    def forBoard(cls, width, height, ruleset="standard"):
+        key = (width, height, ruleset)
+        grid = _grids.get(key)
+        if grid is None:
+            grid = _grids[key] = cls(width, height, ruleset)
+        return grid
+
+    def cellIndex(self, point):
+        return point["y"] * self.width + point["x"]
+
+    def spread(self, mask):
+        """Returns every cell one move away from a cell in mask."""
+        width, full = self.width, self.full
+        if not self.wrapped:
+            return (mask << width | mask >> width | (mask & self.notRight) << 1 | (mask & self.notLeft) >> 1) & full
+        # Shifts that fall off one edge come back in on the other
+        top = self.cells - width
+        rightColumn = self.full & ~self.notRight
+        leftColumn = self.full & ~self.notLeft
+        return (
+            (mask << width) & full | mask >> top
+            | mask >> width | (mask << top) & full
+            | (mask & self.notRight) << 1 | (mask & rightColumn) >> (width - 1)
+            | (mask & self.notLeft) >> 1 | (mask & leftColumn) << (width - 1)
+        ) & full
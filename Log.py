@@ -0,0 +1,93 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+
+# Lowest level written; DEBUG adds a dump of the full game state on every move
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+# Share of the records below WARNING that are kept, e.g. 0.1 for one move line in ten
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "1"))
+
+logger = logging.getLogger("battlesnake")
+_listener = None
+
+
+class Sampler(logging.Filter):
+    """Keeps a random share of routine records; warnings and errors always pass."""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.rate >= 1 or random.random() < self.rate
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Queues records untouched, so their messages are only formatted on the listener thread."""
+
+    def prepare(self, record):
+        return record
+
+
+class StructuredFormatter(logging.Formatter):
+    """Writes each record as one JSON object: time, level, event name and the event's fields."""
+
+    def format(self, record):
+        entry = {"time": round(record.created, 3), "level": record.levelname, "event": record.getMessage()}
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, default=str)
+
+
+def setup(level=LOG_LEVEL, sampleRate=LOG_SAMPLE_RATE, stream=None):
+    """
+    Sends the battlesnake logger through a queue to a background thread that formats and
+    writes the records, so a request thread only ever appends to the queue.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    records = queue.SimpleQueue()
+    handler = DeferredQueueHandler(records)
+    handler.addFilter(Sampler(sampleRate))
+    output = logging.StreamHandler(sys.stdout if stream is None else stream)
+    output.setFormatter(StructuredFormatter())
+    _listener = QueueListener(records, output)
+    _listener.start()
+
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    atexit.register(shutdown)
+
+
+def shutdown():
+    """Writes out whatever is still queued and stops the background thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def event(level, name, **fields):
+    # The fields are only turned into text on the listener thread, and not at all when the
+    # level is off
+    if logger.isEnabledFor(level):
+        logger.log(level, name, extra={"fields": fields})
+
+
+def debug(name, **fields):
+    event(logging.DEBUG, name, **fields)
+
+
+def info(name, **fields):
+    event(logging.INFO, name, **fields)
+
+
+def warning(name, **fields):
+    event(logging.WARNING, name, **fields)
@@ -0,0 +1,184 @@
+import math
+import random
+import time
+
+from Agent import AdversarialSearch
+from Grid import DIRECTIONS
+
+# Exploration constant of the UCB1 formula
+EXPLORATION = 1.4
+
+# Turns played out at random from a new node before it is scored
+ROLLOUT_DEPTH = 8
+
+# Score difference from the average of the live snakes that maps to a reward of about 0.73
+REWARD_SCALE = 50.0
+
+
+class Node:
+    """
+    A position in the search tree. Every snake alive here keeps its own visit counts and
+    reward totals per move, so each one picks its move independently (decoupled UCT).
+    """
+    __slots__ = ("visits", "stats", "children")
+
+    def __init__(self, options):
+        self.visits = 0
+        # One {move: [visits, total reward]} dict per snake, aligned with state.snakes
+        self.stats = [{move: [0, 0.0] for move in moves} for moves in options]
+        self.children = {}
+
+
+class MonteCarloSearch(AdversarialSearch):
+    """
+    Monte Carlo Tree Search over simultaneous moves, as an alternative to the Max-N and
+    paranoid searches. It shares the state, deadline and evaluation of AdversarialSearch
+    and is used the same way; nodes counts playouts and depthReached the deepest tree node.
+    Given a session, the tree is kept after the search and the next turn carries on from
+    the node the moves actually played lead to.
+    """
+
+    def __init__(self, game, maxIterations=None, seed=None, **kwargs):
+        super().__init__(game, **kwargs)
+        self.maxIterations = maxIterations
+        self.random = random.Random(seed)
+        self.root = None
+        self.elapsed = 0.0
+
+    def findOptimalMove(self, safeMoves):
+        if not safeMoves:
+            return None
+        started = time.perf_counter()
+        state = self.initial_state
+        restrict = {self.you: safeMoves}
+        self.root = self.reusedRoot(safeMoves)
+        if self.root is None:
+            self.root = Node(state.jointMoves(restrict))
+        self.nodes = 0
+        self.depthReached = 0
+
+        while self.maxIterations is None or self.nodes < self.maxIterations:
+            if time.perf_counter() >= self.deadline:
+                break
+            base = len(state.history)
+            self.iterate(state, self.root, 0)
+            while len(state.history) > base:
+                state.undo()
+            self.nodes += 1
+
+        self.elapsed = time.perf_counter() - started
+        if self.session is not None:
+            self.session.tree = (state, self.root)
+
+        # The most visited move is the most reliable one
+        ourIndex = next(i for i, snake in enumerate(state.snakes) if snake.index == self.you)
+        stats = self.root.stats[ourIndex]
+        return max(safeMoves, key=lambda move: stats[move][0])
+
+    def reusedRoot(self, safeMoves):
+        """
+        Returns the node of the session's last tree that the moves played since then lead
+        to, with our moves limited to safeMoves, or None when there is no such node.
+        """
+        if self.session is None or self.session.tree is None:
+            return None
+        previous, root = self.session.tree
+        state = self.initial_state
+        if [snake.id for snake in previous.snakes] != [snake.id for snake in state.snakes]:
+            return None
+
+        # Every snake's move is read off where its head went
+        step = previous.grid.step
+        joint = []
+        for before, after in zip(previous.snakes, state.snakes):
+            move = next((d for d in DIRECTIONS if step[d][before.head] == after.head), None)
+            if move is None:
+                return None
+            joint.append(move)
+        joint = tuple(joint)
+        node = root.children.get(joint)
+        if node is None:
+            return None
+
+        # The snakes must have ended up as the tree expects; food is left out, as new food
+        # appears at random and the tree never saw it
+        previous.apply(joint)
+        same = len(previous.snakes) == len(state.snakes) and all(
+            before.hash == after.hash for before, after in zip(previous.snakes, state.snakes)
+        )
+        previous.undo()
+        if not same:
+            return None
+
+        ourIndex = next(i for i, snake in enumerate(state.snakes) if snake.index == self.you)
+        stats = node.stats[ourIndex]
+        for move in list(stats):
+            if move not in safeMoves:
+                del stats[move]
+        for move in safeMoves:
+            stats.setdefault(move, [0, 0.0])
+        return node
+
+    def iterate(self, state, node, depth):
+        """
+        Walks one path down the tree, adds a node at its end, plays a random game out from
+        there and returns the rewards by snake index. Moves are left applied to state.
+        """
+        self.depthReached = max(self.depthReached, depth)
+        if self.gameOver(state):
+            return self.rewards(state)
+
+        # Each snake picks its own move by UCB1, from the statistics it keeps at this node
+        snakes = state.snakes
+        logVisits = math.log(node.visits + 1)
+        joint = []
+        for stats in node.stats:
+            best = None
+            bestValue = float("-inf")
+            for move, (visits, total) in stats.items():
+                if visits == 0:
+                    value = float("inf")
+                else:
+                    value = total / visits + EXPLORATION * math.sqrt(logVisits / visits)
+                if value > bestValue or (value == bestValue and self.random.random() < 0.5):
+                    best = move
+                    bestValue = value
+            joint.append(best)
+        joint = tuple(joint)
+
+        state.apply(joint)
+        child = node.children.get(joint)
+        if child is None:
+            node.children[joint] = Node(state.jointMoves())
+            rewards = self.rollout(state)
+        else:
+            rewards = self.iterate(state, child, depth + 1)
+
+        node.visits += 1
+        for snake, move, stats in zip(snakes, joint, node.stats):
+            entry = stats[move]
+            entry[0] += 1
+            entry[1] += rewards[snake.index]
+        return rewards
+
+    def rollout(self, state):
+        """Plays up to ROLLOUT_DEPTH turns of random safe moves, then scores the position."""
+        choice = self.random.choice
+        for _ in range(ROLLOUT_DEPTH):
+            if self.gameOver(state):
+                break
+            state.apply([choice(moves) for moves in state.jointMoves()])
+        return self.rewards(state)
+
+    def rewards(self, state):
+        """Maps the evaluation of a state to a reward between 0 and 1 for every snake."""
+        scores = self.evaluateBoard(state)
+        rewards = [0.0] * state.numPlayers
+        alive = [snake.index for snake in state.snakes]
+        if len(alive) == 1:
+            rewards[alive[0]] = 1.0
+        elif alive:
+            average = sum(scores[i] for i in alive) / len(alive)
+            for i in alive:
+                rewards[i] = 1.0 / (1.0 + math.exp((average - scores[i]) / REWARD_SCALE))
+        return rewards
@@ -0,0 +1,65 @@
+from Grid import OFF_BOARD
+
+# Below this much health a snake prefers moves that bring it closer to food
+HUNGRY_HEALTH = 40
+
+# Killer moves remembered per snake and ply
+KILLERS_PER_PLY = 2
+
+
+class MoveOrdering:
+    """
+    Orders a snake's moves so that the ones most likely to cause a cutoff are searched
+    first: the transposition table's best move, then killer moves for the ply, then moves
+    with the highest history score, then moves toward food when the snake is hungry.
+    """
+
+    def __init__(self):
+        # (snake index, ply) -> most recent moves that caused a cutoff there
+        self.killers = {}
+        # (snake index, head cell, direction) -> sum of depth squared over its cutoffs
+        self.history = {}
+
+    def orderMoves(self, state, snake, moves, ply, first=None):
+        if len(moves) < 2:
+            return moves
+
+        killers = self.killers.get((snake.index, ply), ())
+        history = self.history
+        head = snake.head
+        index = snake.index
+
+        # Food distance is only worked out when the snake is hungry
+        food = None
+        if snake.health < HUNGRY_HEALTH and state.food:
+            grid = state.grid
+            food = []
+            mask = state.food
+            while mask:
+                low = mask & -mask
+                food.append(low.bit_length() - 1)
+                mask ^= low
+
+        def key(move):
+            tiebreak = 0
+            if food is not None:
+                cell = grid.step[move][head]
+                if cell != OFF_BOARD:
+                    distance = grid.distance[cell]
+                    tiebreak = -min(distance[f] for f in food)
+            return (move == first, move in killers, history.get((index, head, move), 0), tiebreak)
+
+        return sorted(moves, key=key, reverse=True)
+
+    def recordCutoff(self, snake, move, ply, depth):
+        """Remembers that move caused a cutoff for snake at ply with depth left to search."""
+        killers = self.killers.setdefault((snake.index, ply), [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[KILLERS_PER_PLY:]
+        key = (snake.index, snake.head, move)
+        self.history[key] = self.history.get(key, 0) + depth * depth
+
+    def clear(self):
+        self.killers.clear()
+        self.history.clear()
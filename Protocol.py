@@ -0,0 +1,44 @@
+import json
+import time
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; without it the standard library parser is used
+    orjson = None
+
+from Agent import State
+
+
+class GameRequest(dict):
+    """
+    The decoded body of a request: the same game dict the handlers always took, plus the
+    compact State of its board, built while the request was parsed, and the perf_counter
+    time the request was received at, which the move clock counts from.
+    """
+    __slots__ = ("state", "received")
+
+
+def loads(body):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def dumps(value):
+    """Encodes a response body as UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def decodeMove(body, received=None):
+    """
+    Decodes a /move body and builds the search state from it straight away. received is
+    when the request arrived; by default, now.
+    """
+    if received is None:
+        received = time.perf_counter()
+    game = GameRequest(loads(body))
+    game.received = received
+    game.state = State.fromRequest(game)
+    return game
@@ -0,0 +1,346 @@
+import mmap
+import os
+import queue
+import re
+import struct
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import Log
+from Agent import State
+from Grid import DIRECTIONS
+
+# Directory the games are recorded to; an empty value turns recording off
+REPLAY_DIR = os.environ.get("REPLAY_DIR", "replays")
+
+# Recorded games kept in the directory; the oldest files are deleted beyond this
+REPLAY_KEEP = int(os.environ.get("REPLAY_KEEP", "1000"))
+
+# Seconds without a request after which a game that never sent /end is forgotten and its
+# file closed, as after a dropped connection
+REPLAY_IDLE_SECONDS = float(os.environ.get("REPLAY_IDLE_SECONDS", "120"))
+
+# Game files the writer keeps open at once
+REPLAY_OPEN_FILES = 64
+
+MAGIC = b"BSRP"
+VERSION = 1
+
+# Record kinds
+START = 0
+MOVE = 1
+END = 2
+
+# Move code of a record without a move of ours
+NO_MOVE = 255
+
+_header = struct.Struct("<4sB")
+_length = struct.Struct("<I")
+_start = struct.Struct("<BBBH")
+_turn = struct.Struct("<BIBI")
+_snake = struct.Struct("<BBH")
+
+# One record read back: its kind, the turn, the request rebuilt from the compact encoding,
+# our move (or None) and the time we took to answer, in seconds
+Frame = namedtuple("Frame", "kind turn game move seconds")
+
+
+def _string(text):
+    data = text.encode()
+    return bytes((len(data),)) + data
+
+
+def fileName(gameId):
+    return re.sub(r"[^A-Za-z0-9_-]", "_", gameId) + ".bsr"
+
+
+def encodeStart(game, roster):
+    """
+    Encodes what stays fixed over a game: board size, timeout, ruleset, our snake and the
+    id and name of every snake, whose position in roster is its index in later records.
+    """
+    board = game["board"]
+    names = {snake["id"]: snake["name"] for snake in board["snakes"]}
+    parts = [
+        _start.pack(START, board["width"], board["height"], game["game"].get("timeout", 500)),
+        _string(game["game"]["id"]),
+        _string(game["game"].get("ruleset", {}).get("name", "standard")),
+        _string(game["you"]["id"]),
+        bytes((len(roster),)),
+    ]
+    for snakeId in roster:
+        parts.append(_string(snakeId))
+        parts.append(_string(names.get(snakeId, snakeId)))
+    return b"".join(parts)
+
+
+def encodeState(kind, turn, state, roster, move=None, seconds=0.0):
+    """
+    Encodes one position from its compact state: food as the board bitmask, then every
+    snake's roster index, health, length and body cells from head to tail.
+    """
+    code = NO_MOVE if move is None else DIRECTIONS.index(move)
+    parts = [
+        _turn.pack(kind, turn, code, min(int(seconds * 1e6), 0xFFFFFFFF)),
+        state.food.to_bytes((state.grid.cells + 7) // 8, "little"),
+        bytes((len(state.snakes),)),
+    ]
+    for snake in state.snakes:
+        parts.append(_snake.pack(roster.index(snake.id), max(snake.health, 0), snake.length))
+        parts.append(struct.pack(f"<{snake.length}H", *snake.segments()))
+    return b"".join(parts)
+
+
+class Recorder:
+    """
+    Appends every game to its own file of length-prefixed binary records. Records are
+    encoded on the request thread, which is cheap, and written by a background thread.
+    """
+
+    def __init__(self, directory=REPLAY_DIR, keep=REPLAY_KEEP):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+        # (snake ids in the order of the first request, time last seen) of each game, least
+        # recently seen first
+        self.rosters = OrderedDict()
+        self.lock = threading.Lock()
+        self.queue = queue.SimpleQueue()
+        self.files = OrderedDict()
+        self.writer = threading.Thread(target=self.write, name="replay-writer", daemon=True)
+        self.writer.start()
+
+    def roster(self, game):
+        """Returns the roster of a game, queueing its start record the first time it is seen."""
+        gameId = game["game"]["id"]
+        now = time.monotonic()
+        with self.lock:
+            entry = self.rosters.pop(gameId, None)
+            if entry is None:
+                roster = [snake["id"] for snake in game["board"]["snakes"]]
+                self.queue.put((gameId, encodeStart(game, roster)))
+            else:
+                roster = entry[0]
+            self.rosters[gameId] = (roster, now)
+            self.expire(now)
+        return roster
+
+    def expire(self, now):
+        # Called with the lock held; the writer closes the file of every game dropped
+        while self.rosters:
+            gameId, (roster, lastSeen) = next(iter(self.rosters.items()))
+            if now - lastSeen < REPLAY_IDLE_SECONDS:
+                break
+            del self.rosters[gameId]
+            self.queue.put((gameId, None))
+
+    def start(self, game):
+        with self.lock:
+            self.rosters.pop(game["game"]["id"], None)
+        self.roster(game)
+
+    def move(self, game, move, seconds):
+        roster = self.roster(game)
+        state = getattr(game, "state", None)
+        if state is None:
+            state = State.fromRequest(game)
+        self.queue.put((game["game"]["id"], encodeState(MOVE, game["turn"], state, roster, move, seconds)))
+
+    def end(self, game):
+        roster = self.roster(game)
+        gameId = game["game"]["id"]
+        self.queue.put((gameId, encodeState(END, game["turn"], State.fromRequest(game), roster)))
+        self.queue.put((gameId, None))
+        with self.lock:
+            self.rosters.pop(gameId, None)
+
+    def close(self):
+        """Writes out everything queued so far and closes the files."""
+        self.queue.put(None)
+        self.writer.join()
+
+    def write(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            gameId, record = item
+            if record is None:
+                handle = self.files.pop(gameId, None)
+                if handle is not None:
+                    handle.close()
+                continue
+            try:
+                handle = self.files.get(gameId)
+                if handle is None:
+                    handle = self.open(gameId)
+                else:
+                    self.files.move_to_end(gameId)
+                handle.write(_length.pack(len(record)))
+                handle.write(record)
+            except OSError as error:
+                Log.warning("replay_failed", game=gameId, error=repr(error))
+        for handle in self.files.values():
+            handle.close()
+        self.files.clear()
+
+    def open(self, gameId):
+        if len(self.files) >= REPLAY_OPEN_FILES:
+            self.files.popitem(last=False)[1].close()
+        path = os.path.join(self.directory, fileName(gameId))
+        new = not os.path.exists(path)
+        handle = self.files[gameId] = open(path, "ab")
+        if new:
+            handle.write(_header.pack(MAGIC, VERSION))
+            self.rotate()
+        return handle
+
+    def rotate(self):
+        """Deletes the oldest recordings once there are more than keep."""
+        paths = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".bsr")]
+        if len(paths) <= self.keep:
+            return
+        paths.sort(key=lambda entry: entry.stat().st_mtime)
+        open_paths = {handle.name for handle in self.files.values()}
+        for entry in paths[: len(paths) - self.keep]:
+            if entry.path not in open_paths:
+                os.remove(entry.path)
+
+
+def recording(handlers, recorder):
+    """
+    Wraps the start, move and end handlers so that each request is recorded. A request
+    that cannot be recorded is logged and answered as usual.
+    """
+    wrapped = dict(handlers)
+
+    def record(method, game_state, *args):
+        try:
+            method(game_state, *args)
+        except Exception as error:
+            Log.warning("replay_failed", game=game_state.get("game", {}).get("id"), error=repr(error))
+
+    def start(game_state):
+        result = handlers["start"](game_state)
+        record(recorder.start, game_state)
+        return result
+
+    def move(game_state):
+        started = time.perf_counter()
+        result = handlers["move"](game_state)
+        record(recorder.move, game_state, result["move"], time.perf_counter() - started)
+        return result
+
+    def end(game_state):
+        result = handlers["end"](game_state)
+        record(recorder.end, game_state)
+        return result
+
+    wrapped["start"] = start
+    wrapped["move"] = move
+    wrapped["end"] = end
+    return wrapped
+
+
+class ReplayReader:
+    """
+    Reads a recorded game from a memory-mapped file, decoding one record at a time as it
+    is iterated, so large files are never loaded whole.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as handle:
+            self.data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = _header.unpack_from(self.data, 0)
+        if magic != MAGIC or version != VERSION:
+            self.data.close()
+            raise ValueError(f"{path} is not a version {VERSION} replay file")
+        self.width = self.height = 0
+        self.timeout = 500
+        self.gameId = self.ruleset = self.you = None
+        self.roster = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.data.close()
+
+    def __iter__(self):
+        data = self.data
+        offset = _header.size
+        # A record cut short by a crash mid-write ends the game
+        while offset + _length.size <= len(data):
+            (size,) = _length.unpack_from(data, offset)
+            offset += _length.size
+            if offset + size > len(data):
+                break
+            kind = data[offset]
+            if kind == START:
+                self.readStart(offset)
+            else:
+                yield self.readState(offset)
+            offset += size
+
+    def text(self, offset):
+        size = self.data[offset]
+        return self.data[offset + 1:offset + 1 + size].decode(), offset + 1 + size
+
+    def readStart(self, offset):
+        _, self.width, self.height, self.timeout = _start.unpack_from(self.data, offset)
+        offset += _start.size
+        self.gameId, offset = self.text(offset)
+        self.ruleset, offset = self.text(offset)
+        self.you, offset = self.text(offset)
+        count = self.data[offset]
+        offset += 1
+        self.roster = []
+        for _ in range(count):
+            snakeId, offset = self.text(offset)
+            name, offset = self.text(offset)
+            self.roster.append((snakeId, name))
+
+    def readState(self, offset):
+        data = self.data
+        kind, turn, code, micros = _turn.unpack_from(data, offset)
+        width = self.width
+        offset += _turn.size
+        nbytes = (width * self.height + 7) // 8
+        food = int.from_bytes(data[offset:offset + nbytes], "little")
+        offset += nbytes
+        count = data[offset]
+        offset += 1
+
+        snakes = []
+        you = None
+        for _ in range(count):
+            index, health, length = _snake.unpack_from(data, offset)
+            offset += _snake.size
+            cells = struct.unpack_from(f"<{length}H", data, offset)
+            offset += 2 * length
+            snakeId, name = self.roster[index]
+            body = [{"x": cell % width, "y": cell // width} for cell in cells]
+            snake = {"id": snakeId, "name": name, "health": health, "body": body, "head": body[0], "length": length}
+            snakes.append(snake)
+            if snakeId == self.you:
+                you = snake
+
+        foods = []
+        while food:
+            low = food & -food
+            cell = low.bit_length() - 1
+            foods.append({"x": cell % width, "y": cell // width})
+            food ^= low
+        game = {
+            "game": {"id": self.gameId, "ruleset": {"name": self.ruleset}, "timeout": self.timeout},
+            "turn": turn,
+            "board": {"width": width, "height": self.height, "food": foods, "hazards": [], "snakes": snakes},
+            "you": you,
+        }
+        move = None if code == NO_MOVE else DIRECTIONS[code]
+        return Frame(kind, turn, game, move, micros / 1e6)
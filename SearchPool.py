@@ -0,0 +1,191 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+from Agent import DEFAULT_TIMEOUT_MS, MARGIN_MS, SEARCH_MODE, AdversarialSearch, State, searchMode
+from MCTS import MonteCarloSearch
+import Sessions
+
+def availableCpus():
+    """
+    CPUs this process may run on: those in its affinity mask, fewer when a cgroup CPU quota
+    (docker --cpus) allows less, rather than every core of the host.
+    """
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as limit:
+            quota, period = limit.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+
+# Number of search processes; the pool is not started with fewer than two
+SEARCH_WORKERS = int(os.environ.get("SEARCH_WORKERS", str(availableCpus())))
+
+# Time kept back for sending the position to the workers and their results back, in milliseconds
+IPC_MARGIN_MS = 15
+
+_executor = None
+_workers = 0
+
+
+def _warm(worker):
+    # Runs once in each worker so that every process exists before the first move
+    return os.getpid()
+
+
+def start(workers=SEARCH_WORKERS):
+    """Starts the worker processes, which then stay up across every request until shutdown()."""
+    global _executor, _workers
+    if _executor is None and workers >= 2:
+        _executor = ProcessPoolExecutor(max_workers=workers)
+        _workers = workers
+        futures = [_executor.submit(_warm, worker) for worker in range(workers)]
+        for future in futures:
+            future.result()
+    return _executor
+
+
+def shutdown():
+    global _executor, _workers
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+        _workers = 0
+
+
+def running():
+    return _executor is not None
+
+
+def _search(game, share, engine, mode, deadline, maxDepth, seed):
+    """
+    Searches a share of the root in a worker and returns what the parent merges: MCTS
+    searches the whole root from its own seed, minimax the positions after its share of
+    the root's joint moves. Each worker keeps its own sessions, which are dropped by the
+    idle timeout as /end never reaches the workers.
+
+    deadline is a perf_counter time, which is the same clock in every process, so a task
+    that waited in the pool's queue gets only the time left; one picked up after the
+    deadline returns straight away with nothing searched.
+    """
+    if time.perf_counter() >= deadline:
+        if engine == "mcts":
+            return {"visits": {}, "nodes": 0, "depth": 0}
+        return {"completed": [], "exact": False, "nodes": 0, "depth": 0}
+
+    session = Sessions.session(game)
+    if engine == "mcts":
+        agent = MonteCarloSearch(game, margin=0, seed=seed, session=session)
+        agent.deadline = deadline
+        agent.findOptimalMove(share)
+        ourIndex = next(i for i, snake in enumerate(agent.initial_state.snakes) if snake.index == agent.you)
+        visits = {move: stats[0] for move, stats in agent.root.stats[ourIndex].items()}
+        return {"visits": visits, "nodes": agent.nodes, "depth": agent.depthReached}
+
+    agent = AdversarialSearch(game, maxDepth=maxDepth, margin=0, mode=mode, session=session)
+    agent.deadline = deadline
+    completed = agent.searchJoints(share)
+    return {"completed": completed, "exact": agent.exact, "nodes": agent.nodes, "depth": agent.depthReached}
+
+
+class PooledSearch:
+    """
+    Root-parallel search on the worker pool, used like AdversarialSearch.
+
+    Minimax engines deal the joint moves of every snake at the root out across the
+    workers, so up to one worker per joint move is busy, and combine the scores of all of
+    them at the deepest depth every worker finished, exactly as maxN or paranoid combine
+    the children of the root: the move picked is the one a single process searching the
+    same depth picks. MCTS workers all search the full root with different seeds and
+    their visit counts are added up.
+    """
+
+    def __init__(self, game, engine="minimax", state=None, maxDepth=None, mode=SEARCH_MODE, started=None):
+        # The move clock starts when the server received the request, or else as soon as
+        # the request has been handed to us
+        self.started = time.perf_counter() if started is None else started
+        # Every worker stops at this perf_counter time, however long its task was queued
+        timeout = game.get("game", {}).get("timeout", DEFAULT_TIMEOUT_MS)
+        self.deadline = self.started + (timeout - MARGIN_MS - IPC_MARGIN_MS) / 1000
+        self.game = game
+        self.engine = engine
+        self.state = state
+        self.maxDepth = maxDepth
+        self.mode = mode
+        self.nodes = 0
+        self.depthReached = 0
+        self.elapsed = 0.0
+
+    def findOptimalMove(self, safeMoves):
+        if not safeMoves:
+            return None
+        workers = _workers
+
+        mode = None
+        if self.engine == "mcts":
+            shares = [safeMoves] * workers
+        else:
+            # Our options are the safe moves, everyone else's their moves the search would try
+            state = State.fromRequest(self.game) if self.state is None else self.state
+            you = self.game["you"]["id"]
+            ourIndex = next(i for i, snake in enumerate(state.snakes) if snake.id == you)
+            options = state.jointMoves({state.snakes[ourIndex].index: safeMoves})
+            joints = list(product(*options))
+            mode = searchMode(len(state.snakes), self.mode)
+            shares = [joints[i::workers] for i in range(min(workers, len(joints)))]
+        # Only the plain request is sent; each worker builds its own state from it
+        game = dict(self.game)
+        futures = [
+            _executor.submit(_search, game, share, self.engine, mode, self.deadline, self.maxDepth, seed)
+            for seed, share in enumerate(shares)
+        ]
+        results = [future.result() for future in futures]
+
+        self.nodes = sum(result["nodes"] for result in results)
+        self.depthReached = min(result["depth"] for result in results)
+        self.elapsed = time.perf_counter() - self.started
+
+        if self.engine == "mcts":
+            visits = dict.fromkeys(safeMoves, 0)
+            for result in results:
+                for move, count in result["visits"].items():
+                    visits[move] += count
+            return max(safeMoves, key=visits.get)
+
+        # Every joint move needs a score from the same depth: use the deepest one all
+        # workers reached, except those whose whole share was solved at a shallower depth.
+        # Without a score for every joint, as when a task reached its worker too late to
+        # search, the first safe move is played
+        if not all(result["completed"] for result in results):
+            return safeMoves[0]
+        cut = [result["completed"][-1][0] for result in results if not result["exact"]]
+        depth = min(cut) if cut else max(result["completed"][-1][0] for result in results)
+        self.depthReached = depth
+
+        # Like the single-process search, each depth searches the previous depth's choice
+        # first and keeps the first of equal moves, so ties are broken the same way
+        ourSnake = state.snakes[ourIndex].index
+        order = safeMoves
+        for done in range(1, depth + 1):
+            scores = {}
+            for result in results:
+                completed = result["completed"]
+                scores.update(completed[min(done, len(completed)) - 1][1])
+
+            values = {}
+            for joint, eval in scores.items():
+                move = joint[ourIndex]
+                if mode == "paranoid":
+                    # Each of our moves is worth its worst reply
+                    values[move] = min(values.get(move, eval), eval)
+                else:
+                    # As maxN: the total of our scores over the others' moves
+                    values[move] = values.get(move, 0) + eval[ourSnake]
+            best = max(order, key=values.get)
+            order = [best] + [move for move in safeMoves if move != best]
+        return best
@@ -0,0 +1,87 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from TranspositionTable import TranspositionTable
+
+# Games kept at once; the least recently played one is dropped to make room
+SESSION_LIMIT = int(os.environ.get("SESSION_LIMIT", "8"))
+
+# Seconds without a move after which a game that never sent /end is dropped
+SESSION_IDLE_SECONDS = float(os.environ.get("SESSION_IDLE_SECONDS", "120"))
+
+_sessions = OrderedDict()
+_lock = threading.Lock()
+
+
+class Session:
+    """
+    What the search keeps from one turn of a game to the next: the transposition table,
+    and for MCTS the tree of the last search with the state at its root.
+    """
+
+    def __init__(self, roster):
+        self.reset(roster)
+        self.lastSeen = time.monotonic()
+
+    def reset(self, roster):
+        # Snake indices follow the order of the request, so once a snake dies the stored
+        # hashes and score vectors no longer line up and everything is started again
+        self.roster = roster
+        self.table = TranspositionTable()
+        self.tree = None
+
+
+def _roster(game):
+    return tuple(snake["id"] for snake in game["board"]["snakes"])
+
+
+def _key(game):
+    # Several of our snakes can play in one game, as in self-play, and each searches for itself
+    return game["game"]["id"], game["you"]["id"]
+
+
+def _expire(now):
+    while _sessions:
+        key, session = next(iter(_sessions.items()))
+        if len(_sessions) <= SESSION_LIMIT and now - session.lastSeen < SESSION_IDLE_SECONDS:
+            break
+        del _sessions[key]
+
+
+def create(game):
+    """Starts a new session for a game, replacing any left from before."""
+    key = _key(game)
+    now = time.monotonic()
+    with _lock:
+        _sessions.pop(key, None)
+        created = _sessions[key] = Session(_roster(game))
+        _expire(now)
+    return created
+
+
+def session(game):
+    """
+    Returns the session of a game, creating one if the game started before this process
+    did, and marks it as the most recently played.
+    """
+    key = _key(game)
+    roster = _roster(game)
+    now = time.monotonic()
+    with _lock:
+        current = _sessions.get(key)
+        if current is None:
+            current = _sessions[key] = Session(roster)
+        else:
+            _sessions.move_to_end(key)
+            if current.roster != roster:
+                current.reset(roster)
+        current.lastSeen = now
+        _expire(now)
+    return current
+
+
+def close(game):
+    with _lock:
+        _sessions.pop(_key(game), None)
@@ -0,0 +1,93 @@
+import os
+
+from Grid import DELTAS, DIRECTIONS
+
+# Share transposition table entries between mirror images of a position: "1" or "0"
+SYMMETRIC_TT = os.environ.get("SYMMETRIC_TT", "0") == "1"
+
+_symmetries = {}
+
+
+class Symmetry:
+    """
+    The symmetries of one board size, built once and shared like Grid: 8 on a square board
+    (rotations and reflections) and 4 otherwise. Transform 0 is the identity.
+
+    - transforms[t]: (swap, flipX, flipY), applied as mirror x, mirror y, then swap x and y.
+    - cells[t][cell]: the cell that t moves cell to.
+    - moves[t][direction]: the direction t turns direction into.
+    - inverse[t][direction]: the direction that t turns into direction.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        swaps = (False, True) if width == height else (False,)
+        self.transforms = [(swap, flipX, flipY) for swap in swaps for flipX in (False, True) for flipY in (False, True)]
+
+        self.cells = []
+        self.moves = []
+        self.inverse = []
+        for swap, flipX, flipY in self.transforms:
+            cells = []
+            for cell in range(width * height):
+                x, y = cell % width, cell // width
+                if flipX:
+                    x = width - 1 - x
+                if flipY:
+                    y = height - 1 - y
+                if swap:
+                    x, y = y, x
+                cells.append(y * width + x)
+            self.cells.append(tuple(cells))
+
+            moves = {}
+            for direction, (dx, dy) in DELTAS.items():
+                if flipX:
+                    dx = -dx
+                if flipY:
+                    dy = -dy
+                if swap:
+                    dx, dy = dy, dx
+                moves[direction] = next(name for name in DIRECTIONS if DELTAS[name] == (dx, dy))
+            self.moves.append(moves)
+            self.inverse.append({moved: direction for direction, moved in moves.items()})
+
+    @classmethod
+    def forBoard(cls, width, height):
+        key = (width, height)
+        symmetry = _symmetries.get(key)
+        if symmetry is None:
+            symmetry = _symmetries[key] = cls(width, height)
+        return symmetry
+
+    def __len__(self):
+        return len(self.transforms)
+
+    def mapCell(self, t, cell):
+        return self.cells[t][cell]
+
+    def mapMove(self, t, move):
+        """The move on the transformed board; None stays None."""
+        return None if move is None else self.moves[t][move]
+
+    def unmapMove(self, t, move):
+        """The move on the original board that t turns into move; None stays None."""
+        return None if move is None else self.inverse[t][move]
+
+    def mapJoint(self, t, joint):
+        moves = self.moves[t]
+        return tuple(None if move is None else moves[move] for move in joint)
+
+    def unmapJoint(self, t, joint):
+        inverse = self.inverse[t]
+        return tuple(None if move is None else inverse[move] for move in joint)
+
+    def canonical(self, keyOf):
+        """
+        Returns the smallest keyOf(t) over every transform t, and the transform that gives
+        it. Mirror images of a position get the same smallest key, so a table keyed on it
+        holds one entry for all of them, with moves stored as they are on the transformed
+        board and mapped back through unmapMove.
+        """
+        return min((keyOf(t), t) for t in range(len(self.transforms)))
@@ -0,0 +1,79 @@
+def territory(state):
+    """
+    Splits the free cells of the board between the snakes with one multi-source breadth-first
+    search from every head at once, run on bitmasks so each step is a few shifts.
+
+    Body cells open up on the turn the tail has moved off them, so a snake can claim space
+    its own or another snake's tail is leaving behind.
+
+    Parameters:
+    - state (State object): The game state to measure.
+
+    Returns:
+    - List[int]: Cells each snake reaches strictly first, by snake index.
+    - List[int]: Cells each snake reaches at the same time as another snake, by snake index.
+    """
+    grid = state.grid
+    width, full, notLeft, notRight = grid.width, grid.full, grid.notLeft, grid.notRight
+    wrapped = grid.wrapped
+    snakes = state.snakes
+
+    # Bodies block until their tails move away; heads are where the search starts
+    taken = 0
+    fronts = []
+    longest = 0
+    for snake in snakes:
+        taken |= snake.bodyMask | (1 << snake.head)
+        fronts.append(1 << snake.head)
+        longest = max(longest, snake.length)
+    won = [0] * len(snakes)
+    tied = [0] * len(snakes)
+
+    turn = 0
+    while True:
+        turn += 1
+
+        # Free the segment each tail leaves this turn, unless another is stacked on it
+        if turn < longest:
+            for snake in snakes:
+                end = snake.headPos + snake.length - turn
+                if end > snake.headPos:
+                    body, ring = snake.body, snake.ring
+                    cell = body[end & ring]
+                    if cell != body[(end - 1) & ring]:
+                        taken &= ~(1 << cell)
+
+        # Expand every front by one step into cells nobody has taken yet
+        free = full & ~taken
+        grown = []
+        seen = 0
+        shared = 0
+        for front in fronts:
+            if wrapped:
+                cells = grid.spread(front) & free
+            else:
+                cells = (front << width | front >> width | (front & notRight) << 1 | (front & notLeft) >> 1) & free
+            shared |= seen & cells
+            seen |= cells
+            grown.append(cells)
+        if not seen:
+            break
+        taken |= seen
+
+        # Cells reached by two snakes at once are contested and grow no further
+        if shared:
+            for i, cells in enumerate(grown):
+                tied[i] |= cells & shared
+                fronts[i] = cells & ~shared
+                won[i] |= fronts[i]
+        else:
+            fronts = grown
+            for i, cells in enumerate(grown):
+                won[i] |= cells
+
+    reachable = [0] * state.numPlayers
+    contested = [0] * state.numPlayers
+    for i, snake in enumerate(snakes):
+        reachable[snake.index] = won[i].bit_count()
+        contested[snake.index] = tied[i].bit_count()
+    return reachable, contested
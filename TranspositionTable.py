@@ -0,0 +1,159 @@
+import os
+import random
+
+# Bound types of a stored score
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Memory the table may use, in megabytes
+TT_MEGABYTES = int(os.environ.get("TT_MEGABYTES", "16"))
+
+# Rough size of one stored entry: the tuple, its score vector and move tuple
+ENTRY_BYTES = 256
+
+# Health is hashed in buckets of this many points
+HEALTH_BUCKET = 8
+
+_keyCache = {}
+
+
+class ZobristKeys:
+    """
+    Random 64-bit keys for every feature of a position on one board size: the head, body
+    cells, health bucket and length of each snake index, and every food cell.
+    """
+
+    def __init__(self, width, height, numPlayers, seed=2024):
+        rng = random.Random(seed)
+        cells = width * height
+        capacity = 4
+        while capacity < cells + 2:
+            capacity *= 2
+
+        def keys(n):
+            return [rng.getrandbits(64) for _ in range(n)]
+
+        # The extra head key is reached by indexing with OFF_BOARD (-1)
+        self.head = [keys(cells + 1) for _ in range(numPlayers)]
+        self.body = [keys(cells) for _ in range(numPlayers)]
+        self.health = [keys(100 // HEALTH_BUCKET + 1) for _ in range(numPlayers)]
+        self.length = [keys(capacity) for _ in range(numPlayers)]
+        self.food = keys(cells)
+        # Keys of the board's symmetries, see mirrored()
+        self.mirrors = None
+
+    @classmethod
+    def forBoard(cls, width, height, numPlayers):
+        key = (width, height, numPlayers)
+        keys = _keyCache.get(key)
+        if keys is None:
+            keys = _keyCache[key] = cls(width, height, numPlayers)
+        return keys
+
+    def permuted(self, cells):
+        """
+        Keys that hash a position as these keys hash its image under a board symmetry,
+        where cells[c] is the cell c is moved to.
+        """
+        keys = ZobristKeys.__new__(ZobristKeys)
+        # The OFF_BOARD head key stays last
+        keys.head = [[head[cell] for cell in cells] + [head[-1]] for head in self.head]
+        keys.body = [[body[cell] for cell in cells] for body in self.body]
+        keys.health = self.health
+        keys.length = self.length
+        keys.food = [self.food[cell] for cell in cells]
+        keys.mirrors = None
+        return keys
+
+    def mirrored(self, symmetry):
+        """Permuted keys for every transform of symmetry but the identity, built once."""
+        if self.mirrors is None:
+            self.mirrors = [self.permuted(cells) for cells in symmetry.cells[1:]]
+        return self.mirrors
+
+    def snakeHash(self, snake):
+        i = snake.index
+        h = self.head[i][snake.head] ^ self.health[i][max(snake.health, 0) // HEALTH_BUCKET] ^ self.length[i][snake.length]
+        body = self.body[i]
+        mask = snake.bodyMask
+        while mask:
+            low = mask & -mask
+            h ^= body[low.bit_length() - 1]
+            mask ^= low
+        return h
+
+    def snakeDelta(self, i, oldHead, newHead, oldMask, newMask, oldHealth, newHealth, oldLength, newLength):
+        """Returns the value to XOR into a snake's hash after it moved."""
+        h = self.head[i][oldHead] ^ self.head[i][newHead]
+        h ^= self.health[i][max(oldHealth, 0) // HEALTH_BUCKET] ^ self.health[i][max(newHealth, 0) // HEALTH_BUCKET]
+        h ^= self.length[i][oldLength] ^ self.length[i][newLength]
+        body = self.body[i]
+        diff = oldMask ^ newMask
+        while diff:
+            low = diff & -diff
+            h ^= body[low.bit_length() - 1]
+            diff ^= low
+        return h
+
+    def foodHash(self, food):
+        h = 0
+        while food:
+            low = food & -food
+            h ^= self.food[low.bit_length() - 1]
+            food ^= low
+        return h
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of searched positions. Each slot holds two entries: one that is
+    only replaced by a search at least as deep, and one that is always replaced.
+    Entries are (key, depth, bound, scores, move, age) tuples.
+
+    A table kept for a whole game is aged once per turn, so deep entries of positions the
+    game has moved past give way to the current search instead of holding their slots.
+    """
+
+    def __init__(self, megabytes=TT_MEGABYTES):
+        slots = 1
+        while (slots * 2) * 2 * ENTRY_BYTES <= megabytes * 1024 * 1024:
+            slots *= 2
+        self.mask = slots - 1
+        self.deep = [None] * slots
+        self.recent = [None] * slots
+        self.probes = 0
+        self.hits = 0
+        self.age = 0
+
+    def nextAge(self):
+        self.age += 1
+
+    def get(self, key):
+        self.probes += 1
+        i = key & self.mask
+        entry = self.deep[i]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        entry = self.recent[i]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def put(self, key, depth, bound, scores, move):
+        i = key & self.mask
+        entry = (key, depth, bound, scores, move, self.age)
+        deep = self.deep[i]
+        if deep is None or deep[0] == key or depth >= deep[1] or deep[5] != self.age:
+            # The shallower entry this displaces still gets a chance in the other slot
+            if deep is not None and deep[0] != key:
+                self.recent[i] = deep
+            self.deep[i] = entry
+        else:
+            self.recent[i] = entry
+
+    def clear(self):
+        self.deep = [None] * len(self.deep)
+        self.recent = [None] * len(self.recent)
@@ -0,0 +1,112 @@
+# Tunes the evaluation weights by self-play with SPSA (simultaneous perturbation stochastic
+# approximation).
+#
+#   python Tune.py [--iterations 50] [--games 32] [--engine paranoid] [--move-time MS]
+#                  [--workers N] [--size 11] [--seed 0] [--output weights.json]
+#
+# Every iteration perturbs all weights at once by a random +/- step, plays the two
+# perturbed vectors against each other on a process pool, and moves the weights towards
+# the side that won more. The weights are written after every iteration to the file the
+# engine reads at startup, so an interrupted run keeps its progress.
+
+import argparse
+import json
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import Weights
+from Arena import playGame
+
+# Weights that are tuned; offBoard never comes up in a search, as moving off the board
+# eliminates the snake before it is evaluated
+TUNED = ("health", "length", "food", "reachable", "contested")
+
+# Perturbation of each weight, relative to its starting magnitude (at least 1)
+PERTURBATION = 0.2
+
+# SPSA gain schedules: the perturbation shrinks as c / k^GAMMA and the step as a / (k + A)^ALPHA
+ALPHA = 0.602
+GAMMA = 0.101
+STEP_GAIN = 1.0
+STABILITY = 5
+
+
+def matchScore(executor, plus, minus, games, seed, engine, size, moveTime):
+    """Plays plus against minus and returns the wins of plus minus those of minus, per game."""
+    names = [engine, engine]
+    results = executor.map(
+        playGame,
+        range(seed, seed + games),
+        [names] * games,
+        [size] * games,
+        [size] * games,
+        [moveTime] * games,
+        [[plus, minus]] * games,
+    )
+    score = 0
+    for result in results:
+        if result["winner"] == 0:
+            score += 1
+        elif result["winner"] == 1:
+            score -= 1
+    return score / games
+
+
+def tune(iterations, games, engine="paranoid", size=11, moveTime=20, workers=None, seed=0, output=Weights.WEIGHTS_FILE):
+    """
+    Runs SPSA from the current weights and returns the tuned ones, writing them to output
+    after every iteration.
+
+    Parameters:
+    - iterations (int): Number of perturbed matches to play.
+    - games (int): Games per match, split between the workers.
+    - engine (str): Arena search player the weights are tuned for.
+    - size (int): Board width and height.
+    - moveTime (int): Search time per move in milliseconds.
+    - workers (int): Processes to play on, or None for all cores.
+    - seed (int): Seed of the perturbations and of the first game.
+    - output (str): File the tuned weights are written to.
+
+    Returns:
+    - Dict[str, float]: The tuned weights.
+    """
+    rng = random.Random(seed)
+    weights = Weights.load()
+    scales = {name: PERTURBATION * max(abs(weights[name]), 1.0) for name in TUNED}
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for k in range(1, iterations + 1):
+            spread = 1 / k ** GAMMA
+            gain = STEP_GAIN * (1 + STABILITY) ** ALPHA / (k + STABILITY) ** ALPHA
+            signs = {name: rng.choice((-1, 1)) for name in TUNED}
+            plus = dict(weights)
+            minus = dict(weights)
+            for name in TUNED:
+                step = spread * scales[name] * signs[name]
+                plus[name] += step
+                minus[name] -= step
+
+            score = matchScore(executor, plus, minus, games, seed + k * games, engine, size, moveTime)
+
+            # Move every weight towards the perturbation that won, by up to one step
+            for name in TUNED:
+                weights[name] += gain * score * spread * scales[name] * signs[name]
+
+            Weights.save(weights, output, iterations=k, engine=engine, size=size, moveTime=moveTime)
+            print(json.dumps({"iteration": k, "score": round(score, 3), "weights": {name: round(weights[name], 4) for name in TUNED}}))
+    return weights
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--games", type=int, default=32, help="games per iteration")
+    parser.add_argument("--engine", default="paranoid", choices=("maxn", "paranoid", "mcts"))
+    parser.add_argument("--move-time", type=int, default=20, help="search time per move in ms")
+    parser.add_argument("--workers", type=int, default=None, help="processes to play on (default: all cores)")
+    parser.add_argument("--size", type=int, default=11, help="board width and height")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=Weights.WEIGHTS_FILE, help="weights file to write")
+    args = parser.parse_args()
+
+    tune(args.iterations, args.games, args.engine, args.size, args.move_time, args.workers, args.seed, args.output)
@@ -0,0 +1,40 @@
+import json
+import os
+
+# Weights of the evaluation terms: health, length, distance to the nearest food (which is
+# subtracted), cells a snake reaches first, cells it ties for, and a head off the board
+DEFAULT_WEIGHTS = {
+    "health": 1.0,
+    "length": 2.0,
+    "food": 1.0,
+    "reachable": 1.0,
+    "contested": 0.5,
+    "offBoard": -500.0,
+}
+
+# Tuned weights written by Tune.py; read once when the engine is imported
+WEIGHTS_FILE = os.environ.get("EVAL_WEIGHTS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights.json"))
+
+
+def load(path=WEIGHTS_FILE):
+    """Returns the default weights, with those stored in path in their place if it exists."""
+    weights = dict(DEFAULT_WEIGHTS)
+    if path and os.path.exists(path):
+        with open(path) as stored:
+            values = json.load(stored)
+        for name, value in values.get("weights", {}).items():
+            if name in weights:
+                weights[name] = float(value)
+    return weights
+
+
+def save(weights, path=WEIGHTS_FILE, **details):
+    """Writes weights to path, replacing the old file only once the new one is complete."""
+    partial = path + ".tmp"
+    with open(partial, "w") as output:
+        json.dump({"weights": weights, **details}, output, indent=2)
+        output.write("\n")
+    os.replace(partial, path)
+
+
+WEIGHTS = load()
@@ -0,0 +1,372 @@
+# Benchmarks of the search engines.
+#
+#   python benchmark.py [--suite harness|modes|ordering|symmetry] [--time MS] [--positions N]
+#                       [--engines maxn,paranoid,mcts] [--replays DIR] [--output FILE]
+#                       [--compare BASELINE] [--tolerance 0.1]
+#
+# The harness runs every engine over a corpus of synthetic 2-, 4- and 8-snake boards on
+# 7x7, 11x11 and 19x19, plus positions sampled from recorded games, once to a fixed depth
+# and once for a fixed time per move. It writes one JSON document with the nodes/sec,
+# depth reached, time-to-move percentiles and peak memory of each corpus and engine;
+# given a baseline written by an earlier run, it lists what got worse and exits with 1.
+#
+# The modes suite gives each search mode the same positions and the same time per move,
+# and the ordering suite runs paranoid search to a fixed depth with and without move
+# ordering to count the nodes it saves. The symmetry suite measures what folding mirror
+# images together gains: transposition table hits of fixed-depth searches with and without
+# symmetric hashing, and opening book entries with and without canonical keys.
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from itertools import product
+
+import Book
+from Agent import AdversarialSearch, State
+from BookBuilder import startRequests
+from TranspositionTable import TranspositionTable
+from MCTS import MonteCarloSearch
+from Replay import MOVE, REPLAY_DIR, ReplayReader
+
+# Boards and snake counts of the synthetic corpus
+BOARD_SIZES = (7, 11, 19)
+SNAKE_COUNTS = (2, 4, 8)
+
+# Depth of the fixed-depth runs by snake count, and playouts of a fixed-depth MCTS run;
+# every extra snake multiplies the joint moves of each turn by about three
+FIXED_DEPTHS = {1: 6, 2: 4, 3: 3, 4: 2, 8: 1}
+FIXED_ITERATIONS = 300
+
+# Positions sampled from each recorded game
+POSITIONS_PER_GAME = 10
+
+
+def syntheticGame(numSnakes, width=11, height=11, length=4, food=5, seed=0, timeout=500):
+    """Builds a Battlesnake move request with snakes laid out by random walks."""
+    rng = random.Random(seed)
+    taken = set()
+    snakes = []
+
+    for i in range(numSnakes):
+        # Retry until a walk of the full length fits on the free cells
+        while True:
+            x, y = rng.randrange(width), rng.randrange(height)
+            if (x, y) in taken:
+                continue
+            body = [(x, y)]
+            while len(body) < length:
+                bx, by = body[-1]
+                steps = [(bx + dx, by + dy) for dx, dy in ((0, 1), (0, -1), (-1, 0), (1, 0))]
+                steps = [
+                    (sx, sy) for sx, sy in steps
+                    if 0 <= sx < width and 0 <= sy < height and (sx, sy) not in taken and (sx, sy) not in body
+                ]
+                if not steps:
+                    break
+                body.append(rng.choice(steps))
+            if len(body) == length:
+                break
+        taken.update(body)
+        points = [{"x": bx, "y": by} for bx, by in body]
+        snakes.append({
+            "id": f"snake-{i}",
+            "name": f"snake-{i}",
+            "health": rng.randint(40, 100),
+            "body": points,
+            "head": points[0],
+            "length": length,
+            "latency": "0",
+            "shout": "",
+        })
+
+    free = [(x, y) for x in range(width) for y in range(height) if (x, y) not in taken]
+    return {
+        "game": {"id": f"synthetic-{seed}", "ruleset": {"name": "standard"}, "timeout": timeout},
+        "turn": 10,
+        "board": {
+            "width": width,
+            "height": height,
+            "food": [{"x": x, "y": y} for x, y in rng.sample(free, food)],
+            "hazards": [],
+            "snakes": snakes,
+        },
+        "you": snakes[0],
+    }
+
+
+def ourMoves(agent):
+    """Our safe moves in the agent's position, as main.move would pass them."""
+    state = agent.initial_state
+    return state.snakeMoves(next(snake for snake in state.snakes if snake.index == agent.you), state.blockedCells())
+
+
+def corpus(positions, replayDir=REPLAY_DIR):
+    """
+    Returns (label, game) pairs: positions synthetic boards for every board size and snake
+    count, then positions spread over each game recorded in replayDir.
+    """
+    games = []
+    for size in BOARD_SIZES:
+        for numSnakes in SNAKE_COUNTS:
+            length = 3 if size < 11 else 4
+            for seed in range(positions):
+                games.append((f"{numSnakes}snakes-{size}x{size}", syntheticGame(numSnakes, size, size, length, seed=seed)))
+
+    if replayDir and os.path.isdir(replayDir):
+        for name in sorted(os.listdir(replayDir)):
+            if not name.endswith(".bsr"):
+                continue
+            with ReplayReader(os.path.join(replayDir, name)) as reader:
+                frames = [frame for frame in reader if frame.kind == MOVE and frame.game["you"] is not None]
+            step = max(1, len(frames) // POSITIONS_PER_GAME)
+            games.extend(("recorded", frame.game) for frame in frames[::step][:POSITIONS_PER_GAME])
+    return games
+
+
+def fixedDepth(numSnakes):
+    return FIXED_DEPTHS[max(count for count in FIXED_DEPTHS if count <= max(numSnakes, 1))]
+
+
+def searchOnce(engine, game, timeout=None):
+    """
+    Searches one position from scratch, to a fixed depth when timeout is None and for
+    timeout milliseconds otherwise, and returns the agent and the time to move in seconds.
+    """
+    started = time.perf_counter()
+    if timeout is None:
+        if engine == "mcts":
+            agent = MonteCarloSearch(game, maxIterations=FIXED_ITERATIONS, seed=0, timeout=float("inf"))
+        else:
+            depth = fixedDepth(len(game["board"]["snakes"]))
+            agent = AdversarialSearch(game, maxDepth=depth, timeout=float("inf"), mode=engine)
+    elif engine == "mcts":
+        agent = MonteCarloSearch(game, seed=0, timeout=timeout, margin=0)
+    else:
+        agent = AdversarialSearch(game, timeout=timeout, mode=engine, margin=0)
+    agent.findOptimalMove(ourMoves(agent))
+    return agent, time.perf_counter() - started
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))]
+
+
+def runHarness(games, engines, timeout):
+    """
+    Runs every engine over the corpus at a fixed depth and at a fixed time and summarises
+    each corpus label, engine and budget. Peak memory is measured in a separate traced run
+    of the fixed-depth search on the first position of each label, since tracing slows the
+    search down several times.
+    """
+    labels = list(dict.fromkeys(label for label, _ in games))
+    results = []
+    for engine in engines:
+        for budget in ("depth", "time"):
+            for label in labels:
+                positions = [game for gameLabel, game in games if gameLabel == label]
+                nodes = 0
+                elapsed = 0.0
+                depths = []
+                times = []
+                peak = 0
+                for game in positions:
+                    agent, seconds = searchOnce(engine, game, None if budget == "depth" else timeout)
+                    nodes += agent.nodes
+                    elapsed += agent.elapsed
+                    depths.append(agent.depthReached)
+                    times.append(seconds * 1000)
+                    if budget == "depth" and game is positions[0]:
+                        tracemalloc.start()
+                        searchOnce(engine, game)
+                        peak = max(peak, tracemalloc.get_traced_memory()[1])
+                        tracemalloc.stop()
+
+                results.append({
+                    "corpus": label,
+                    "engine": engine,
+                    "budget": budget,
+                    "positions": len(positions),
+                    "nodesPerSec": round(nodes / elapsed) if elapsed else 0,
+                    "depth": {"mean": round(sum(depths) / len(depths), 2), "min": min(depths), "max": max(depths)},
+                    "timeToMoveMs": {
+                        "p50": round(percentile(times, 0.5), 2),
+                        "p90": round(percentile(times, 0.9), 2),
+                        "p99": round(percentile(times, 0.99), 2),
+                        "max": round(max(times), 2),
+                    },
+                    "peakMemoryKB": round(peak / 1024) if budget == "depth" else None,
+                })
+    return results
+
+
+def compareResults(results, baseline, tolerance):
+    """
+    Lists the results that got worse than the baseline by more than tolerance: fewer
+    nodes/sec, a higher p99 time to move at fixed depth, or more peak memory.
+    """
+    previous = {(result["corpus"], result["engine"], result["budget"]): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result["corpus"], result["engine"], result["budget"]))
+        if before is None:
+            continue
+        checks = [("nodesPerSec", before["nodesPerSec"], result["nodesPerSec"], -1)]
+        if result["budget"] == "depth":
+            checks.append(("timeToMoveMs.p99", before["timeToMoveMs"]["p99"], result["timeToMoveMs"]["p99"], 1))
+            checks.append(("peakMemoryKB", before["peakMemoryKB"], result["peakMemoryKB"], 1))
+        for metric, old, new, worse in checks:
+            if old and (new - old) * worse > tolerance * old:
+                regressions.append({
+                    "corpus": result["corpus"],
+                    "engine": result["engine"],
+                    "budget": result["budget"],
+                    "metric": metric,
+                    "baseline": old,
+                    "current": new,
+                })
+    return regressions
+
+
+def compareModes(snakeCounts, positions, timeout):
+    results = []
+    for numSnakes in snakeCounts:
+        games = [syntheticGame(numSnakes, seed=seed, timeout=timeout) for seed in range(positions)]
+        for mode in ("maxn", "paranoid", "mcts"):
+            nodes = 0
+            depth = 0
+            elapsed = 0.0
+            for game in games:
+                if mode == "mcts":
+                    agent = MonteCarloSearch(game, seed=0)
+                else:
+                    agent = AdversarialSearch(game, mode=mode)
+                started = time.perf_counter()
+                agent.findOptimalMove(agent.initial_state.jointMoves()[0])
+                elapsed += time.perf_counter() - started
+                nodes += agent.nodes
+                depth += agent.depthReached
+            results.append({
+                "snakes": numSnakes,
+                "mode": mode,
+                "nodesPerSec": round(nodes / elapsed),
+                "avgDepth": round(depth / len(games), 2),
+            })
+    return results
+
+
+def compareOrdering(depths, positions):
+    results = []
+    for numSnakes, depth in depths.items():
+        games = [syntheticGame(numSnakes, seed=seed) for seed in range(positions)]
+        for ordering in (False, True):
+            nodes = 0
+            for game in games:
+                agent = AdversarialSearch(game, maxDepth=depth, timeout=float("inf"), mode="paranoid", ordering=ordering)
+                agent.findOptimalMove(agent.initial_state.jointMoves()[0])
+                nodes += agent.nodes
+            results.append({
+                "snakes": numSnakes,
+                "depth": depth,
+                "ordering": ordering,
+                "nodes": nodes,
+            })
+    return results
+
+
+def compareSymmetry(positions):
+    results = []
+    starts = list(startRequests(2))
+    sets = {
+        "starts-2snakes": starts[::max(1, len(starts) // positions)][:positions],
+        "2snakes-11x11": [syntheticGame(2, seed=seed) for seed in range(positions)],
+        "4snakes-11x11": [syntheticGame(4, seed=seed) for seed in range(positions)],
+    }
+    # A table per search, as a move is searched, and one shared by every position of a
+    # set, as a cache kept across games would be
+    for label, games in sets.items():
+        for shared, symmetric in product((False, True), (False, True)):
+            nodes = probes = hits = 0
+            table = TranspositionTable()
+            started = time.perf_counter()
+            for game in games:
+                if not shared:
+                    table = TranspositionTable()
+                probes -= table.probes
+                hits -= table.hits
+                depth = fixedDepth(len(game["board"]["snakes"]))
+                agent = AdversarialSearch(game, maxDepth=depth, timeout=float("inf"), table=table, mode="paranoid", symmetric=symmetric)
+                agent.findOptimalMove(agent.initial_state.jointMoves()[0])
+                nodes += agent.nodes
+                probes += table.probes
+                hits += table.hits
+            results.append({
+                "positions": label,
+                "sharedTable": shared,
+                "symmetric": symmetric,
+                "nodes": nodes,
+                "ttHitRate": round(hits / probes, 4) if probes else 0.0,
+                "seconds": round(time.perf_counter() - started, 3),
+            })
+
+    # Every start of 2 to 4 snakes from every seat, as the book builder sees them
+    plain = set()
+    canonical = set()
+    for numSnakes in (2, 3, 4):
+        for game in startRequests(numSnakes):
+            state = State.fromRequest(game)
+            for you in range(numSnakes):
+                plain.add(Book.positionKey(state, you))
+                canonical.add(Book.canonicalKey(state, you)[0])
+    results.append({"positions": "book-starts", "entries": len(plain), "canonicalEntries": len(canonical)})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--suite", choices=("harness", "modes", "ordering", "symmetry"), default="harness")
+    parser.add_argument("--time", type=int, default=500, help="move timeout in ms")
+    parser.add_argument("--positions", type=int, default=5, help="positions per board and snake count")
+    parser.add_argument("--engines", default="maxn,paranoid,mcts", help="comma-separated engines for the harness")
+    parser.add_argument("--replays", default=REPLAY_DIR, help="directory of recorded games to add to the corpus")
+    parser.add_argument("--output", help="file to write the harness results to instead of stdout")
+    parser.add_argument("--compare", help="harness results of an earlier run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    if args.suite == "modes":
+        for result in compareModes((2, 3, 4), args.positions, args.time):
+            print(json.dumps(result))
+    elif args.suite == "ordering":
+        for result in compareOrdering({2: 6, 3: 4, 4: 3}, args.positions):
+            print(json.dumps(result))
+    elif args.suite == "symmetry":
+        for result in compareSymmetry(args.positions):
+            print(json.dumps(result))
+    else:
+        games = corpus(args.positions, args.replays)
+        report = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "timeMs": args.time,
+            "results": runHarness(games, args.engines.split(","), args.time),
+        }
+        regressions = []
+        if args.compare:
+            with open(args.compare) as baseline:
+                regressions = compareResults(report["results"], json.load(baseline), args.tolerance)
+            report["regressions"] = regressions
+
+        text = json.dumps(report, indent=2, sort_keys=True)
+        if args.output:
+            with open(args.output, "w") as output:
+                output.write(text + "\n")
+        else:
+            print(text)
+        if regressions:
+            sys.exit(1)
@@ -10,16 +10,28 @@
 # To get you started we've included code to prevent your Battlesnake from moving backwards.
 # For more info see docs.battlesnake.com
 
+import os
 import random
 import typing
-from Agent import AdversarialSearch
+from Agent import AdversarialSearch, State
+from Grid import OFF_BOARD
+from MCTS import MonteCarloSearch
+import Book
+import Endgame
+import Log
+import SearchPool
+import Sessions
+
+# Search engine used for every move: "minimax" (Max-N / paranoid) or "mcts"
+ENGINES = {"minimax": AdversarialSearch, "mcts": MonteCarloSearch}
+SEARCH_ENGINE = os.environ.get("SEARCH_ENGINE", "minimax")
 
 
 # info is called when you create your Battlesnake on play.battlesnake.com
 # and controls your Battlesnake's appearance
 # TIP: If you open your Battlesnake URL in a browser you should see this data
 def info() -> typing.Dict:
-    print("INFO")
+    Log.info("info")
 
     return {
         "apiversion": "1",
@@ -32,98 +44,44 @@ def info() -> typing.Dict:
 
 # start is called when your Battlesnake begins a game
 def start(game_state: typing.Dict):
-    print("GAME START")
+    # The search keeps its tables for this game until end
+    Sessions.create(game_state)
+    Log.info("game_start", game=game_state["game"]["id"])
 
 
 # end is called when your Battlesnake finishes a game
 def end(game_state: typing.Dict):
-    print("GAME OVER\n")
+    Sessions.close(game_state)
+    Log.info("game_over", game=game_state["game"]["id"], turn=game_state["turn"])
 
 
 # move is called on every turn and returns your next move
 # Valid moves are "up", "down", "left", or "right"
 # See https://docs.battlesnake.com/api/example-move for available data
 def move(game_state: typing.Dict) -> typing.Dict:
-    print("game_state:", game_state)
+    # The whole request is only dumped when debug logging is on
+    Log.debug("game_state", state=game_state)
     is_move_safe = {"up": True, "down": True, "left": True, "right": True}
 
-    # We've included code to prevent your Battlesnake from moving backwards
-    my_head = game_state["you"]["body"][0]  # Coordinates of your head
-    my_neck = game_state["you"]["body"][1]  # Coordinates of your "neck"
-
-    if my_neck["x"] < my_head["x"]:  # Neck is left of head, don't move left
-        is_move_safe["left"] = False
-
-    elif my_neck["x"] > my_head["x"]:  # Neck is right of head, don't move right
-        is_move_safe["right"] = False
-
-    elif my_neck["y"] < my_head["y"]:  # Neck is below head, don't move down
-        is_move_safe["down"] = False
-
-    elif my_neck["y"] > my_head["y"]:  # Neck is above head, don't move up
-        is_move_safe["up"] = False
-
-    # Prevent your Battlesnake from moving out of bounds
-    board_width = game_state['board']['width']
-    board_height = game_state['board']['height']
-
-    # If head is at the left edge, cannot move left
-    if my_head["x"] == 0:
-        is_move_safe["left"] = False
-
-    # If head is at the right edge, cannot move right
-    if my_head["x"] == board_width - 1:
-        is_move_safe["right"] = False
-
-    # If head is at the bottom edge, cannot move down
-    if my_head["y"] == 0:
-        is_move_safe["down"] = False
+    # Compact board state, already built by the request parser when the server decoded it
+    state = getattr(game_state, "state", None)
+    if state is None:
+        state = State.fromRequest(game_state)
+    # When the server received the request, which the move clock counts from
+    received = getattr(game_state, "received", None)
+    grid = state.grid
 
-    # If head is at the top edge, cannot move up
-    if my_head["y"] == board_height - 1:
-        is_move_safe["up"] = False
+    my_head = grid.cellIndex(game_state["you"]["body"][0])  # Cell of your head
 
-    # Prevent your Battlesnake from colliding with itself
-    my_body = game_state['you']['body']
+    # Cells still taken next turn: every body segment of every snake (us included),
+    # except the tails, which move away. This also stops us moving back into our neck.
+    occupied = state.blockedCells()
 
-    ## Do not move into the body of the snake
-    for segment in my_body[2:]: # Skip head
-
-        # Is segment to left of head
-        if segment["x"] == my_head["x"] - 1 and segment["y"] == my_head["y"]: 
-            is_move_safe["left"] = False
-
-        # Is segment to right of head
-        if segment["x"] == my_head["x"] + 1 and segment["y"] == my_head["y"]:
-            is_move_safe["right"] = False
-
-        # Is segment above head
-        if segment["y"] == my_head["y"] + 1 and segment["x"] == my_head["x"]:
-            is_move_safe["up"] = False
-
-        # Is segment below head
-        if segment["y"] == my_head["y"] - 1 and segment["x"] == my_head["x"]:
-            is_move_safe["down"] = False
-
-    # Prevent your Battlesnake from colliding with other Battlesnakes
-    opponents = game_state['board']['snakes']
-
-    # Loop through each opponent snake
-    for opponent in opponents:
-        # Loop through each body segment of the opponent snake (excluding the tail since it moves)
-        for segment in opponent["body"][:-1]:
-            # Check if a segment is directly left of my snake's head
-            if segment["x"] == my_head["x"] - 1 and segment["y"] == my_head["y"]:
-                is_move_safe["left"] = False
-            # Check if a segment is directly right of my snake's head
-            if segment["x"] == my_head["x"] + 1 and segment["y"] == my_head["y"]:
-                is_move_safe["right"] = False
-            # Check if a segment is directly above my snake's head
-            if segment["x"] == my_head["x"] and segment["y"] == my_head["y"] + 1:
-                is_move_safe["up"] = False
-            # Check if a segment is directly below my snake's head
-            if segment["x"] == my_head["x"] and segment["y"] == my_head["y"] - 1:
-                is_move_safe["down"] = False
+    # Prevent your Battlesnake from moving out of bounds or into any body
+    for direction in is_move_safe:
+        cell = grid.step[direction][my_head]
+        if cell == OFF_BOARD or occupied >> cell & 1:
+            is_move_safe[direction] = False
 
     # Are there any safe moves left?
     safe_moves = []
@@ -132,36 +90,54 @@ def move(game_state: typing.Dict) -> typing.Dict:
             safe_moves.append(move)
 
     if len(safe_moves) == 0:
-        print(f"MOVE {game_state['turn']}: No safe moves detected! Moving down")
+        Log.warning("no_safe_moves", game=game_state["game"]["id"], turn=game_state["turn"], move="down")
         return {"move": "down"}
 
     # Choose a random move from the safe ones
     next_move = random.choice(safe_moves)
 
-    agent = AdversarialSearch(game=game_state)
+    # Opening positions come from the book, which searched them offline far deeper than a turn allows
+    you = next(snake.index for snake in state.snakes if snake.id == game_state["you"]["id"])
+    book = Book.book()
+    book_move = book.lookup(state, you, game_state["turn"]) if book is not None else None
+    if book_move in safe_moves:
+        Log.info("move", game=game_state["game"]["id"], turn=game_state["turn"], move=book_move, source="book")
+        return {"move": book_move}
+
+    # Root-parallel on the worker pool when the server started one, where each worker keeps
+    # its own sessions; otherwise the search picks up from this game's previous turn
+    if SearchPool.running():
+        agent = SearchPool.PooledSearch(game=game_state, engine=SEARCH_ENGINE, state=state, started=received)
+    else:
+        agent = ENGINES[SEARCH_ENGINE](game=game_state, session=Sessions.session(game_state), state=state, started=received)
+
+    # Small 1v1 endgames are first solved outright, within the time the search was given
+    # and never past its deadline; a forced win is played as it is
+    if Endgame.isEndgame(state):
+        solver = Endgame.EndgameSolver(state, you, deadline=agent.deadline)
+        win_move = solver.solve(safe_moves)
+        if win_move is not None:
+            Log.info(
+                "move", game=game_state["game"]["id"], turn=game_state["turn"], move=win_move,
+                source="endgame", depth=solver.depthReached, nodes=solver.nodes,
+            )
+            return {"move": win_move}
+
     next_move = agent.findOptimalMove(safeMoves=safe_moves)
 
     # Food check
     if len(safe_moves) > 1:
-        foods = game_state["board"]["food"]
-
         ## is a safe move food?
-        for food in foods:
-            for move in safe_moves:
-                if move == "up" and food["y"] == my_head["y"] + 1 and food["x"] == my_head["x"]:
-                    next_move = "up"
-                    break
-                elif move == "down" and food["y"] == my_head["y"] - 1 and food["x"] == my_head["x"]:
-                    next_move = "down"
-                    break
-                elif move == "right" and food["x"] == my_head["x"] + 1 and food["y"] == my_head["y"]:
-                    next_move = "right"
-                    break
-                elif move == "left" and food["x"] == my_head["x"] - 1 and food["y"] == my_head["y"]:
-                    next_move = "left"
-                    break
-
-    print(f"MOVE {game_state['turn']}: {next_move}")
+        for move in safe_moves:
+            if state.food >> grid.step[move][my_head] & 1:
+                next_move = move
+                break
+
+    rate = agent.nodes / agent.elapsed if agent.elapsed else 0
+    Log.info(
+        "move", game=game_state["game"]["id"], turn=game_state["turn"], move=next_move,
+        depth=agent.depthReached, nodes=agent.nodes, nodes_per_sec=round(rate),
+    )
     return {"move": next_move}
 
 
@@ -8,6 +8,10 @@ playerMarbleStrings = {
     playerMarble[1]: 1
 }
 
+# Terms the evaluation adds up: "full" counts both the threats and the marbles in the
+# center columns, "threats" and "center" only one of them
+EVALUATORS = ("full", "threats", "center")
+
 class State:
     def __init__(self, board, marble, top):
         self.board = board
@@ -17,9 +21,13 @@ class State:
         self.availableMoves = [c for c in range(len(top)) if top[c] < len(self.board)]
 
 class AdversarialSearch:
-    def __init__(self, marble, depth):
+    def __init__(self, marble, depth, evaluator="full"):
         self.marble = marble # The maximizing players's marble
         self.depth = depth
+        if evaluator not in EVALUATORS:
+            raise ValueError(f"unknown evaluator {evaluator!r}")
+        self.evaluator = evaluator
+        self.nodes = 0 # States searched, for benchmarking
 
     def findOptimalMove(self, board, top):
         currentState = State(board, self.marble, top)
@@ -62,6 +70,7 @@ class AdversarialSearch:
         the game tree and reduce the number of states evaluated.
 
         """
+        self.nodes += 1
         if depth == 0 or gameOver(state):
             return self.evaluateBoard(state)
     
@@ -113,24 +122,26 @@ class AdversarialSearch:
             return 0
 
         # Count threats
-        # Counting threats for 3 marbles and 1 space
-        value += 7 * count_threats_for_n(state.board, self.marble, 3)
-        value -= 7 * count_threats_for_n(state.board, OPPONENT_MARBLE, 3)
-        # Counting threats for 2 marbles and 2 spaces
-        value += 5 * count_threats_for_n(state.board, self.marble, 2)
-        value -= 5 * count_threats_for_n(state.board, OPPONENT_MARBLE, 2)
-        # Counting threats for 1 marble and 3 spaces
-        value += 3 * count_threats_for_n(state.board, self.marble, 1)
-        value -= 3 * count_threats_for_n(state.board, OPPONENT_MARBLE, 1)
+        if self.evaluator != "center":
+            # Counting threats for 3 marbles and 1 space
+            value += 7 * count_threats_for_n(state.board, self.marble, 3)
+            value -= 7 * count_threats_for_n(state.board, OPPONENT_MARBLE, 3)
+            # Counting threats for 2 marbles and 2 spaces
+            value += 5 * count_threats_for_n(state.board, self.marble, 2)
+            value -= 5 * count_threats_for_n(state.board, OPPONENT_MARBLE, 2)
+            # Counting threats for 1 marble and 3 spaces
+            value += 3 * count_threats_for_n(state.board, self.marble, 1)
+            value -= 3 * count_threats_for_n(state.board, OPPONENT_MARBLE, 1)
 
         # Optimizes for center columns
-        center_columns = list(range(1, len(state.board[0]) - 1))
-        for row in state.board:
-            for col in center_columns:
-                if row[col] == self.marble:
-                    value += 1
-                elif row[col] == OPPONENT_MARBLE:
-                    value -= 1
+        if self.evaluator != "threats":
+            center_columns = list(range(1, len(state.board[0]) - 1))
+            for row in state.board:
+                for col in center_columns:
+                    if row[col] == self.marble:
+                        value += 1
+                    elif row[col] == OPPONENT_MARBLE:
+                        value -= 1
             
         return value
 
@@ -1,13 +1,21 @@
 from AdversarialSearch import AdversarialSearch
+from BitboardSearch import BitboardSearch
 
 class AgentPlayer:
 
-    def __init__(self, marble, name, depth):
+    def __init__(self, marble, name, depth, backend="list", timeLimit=None, evaluator="full"):
         self.name = "Agent_Player_" + name # Agent Name
         self.myMarble = marble # Agent Marble
         self.depth = depth
-        # Create Adversarial Search Agent
-        self.agent = AdversarialSearch(self.myMarble, self.depth)
+        # Create Adversarial Search Agent: "list" copies the board at every node, "bitboard"
+        # plays moves in place with a transposition table, and can stop deepening at timeLimit seconds.
+        # evaluator picks the terms of the evaluation, see EVALUATORS in AdversarialSearch.py
+        if backend == "bitboard":
+            self.agent = BitboardSearch(self.myMarble, self.depth, timeLimit, evaluator)
+        elif backend == "list":
+            self.agent = AdversarialSearch(self.myMarble, self.depth, evaluator)
+        else:
+            raise ValueError(f"unknown search backend {backend!r}")
 
     # Method to determine which move to make on the board (by calling search agent)
     def move(self, board, top):
@@ -0,0 +1,163 @@
+from Board import Rows, Columns, Goal
+
+# Each column takes Rows + 1 bits; the spare top bit keeps lines from running into the
+# next column. Cell (row, col) is bit col * HEIGHT + row.
+HEIGHT = Rows + 1
+
+# The bottom cell of every column, and every playable cell
+BOTTOM = sum(1 << (col * HEIGHT) for col in range(Columns))
+FULL = BOTTOM * ((1 << Rows) - 1)
+
+# Shifts that step one cell up, across, and along both diagonals
+SHIFTS = (1, HEIGHT, HEIGHT - 1, HEIGHT + 1)
+
+# Columns tried first: the centre ones take part in the most lines
+ORDER = sorted(range(Columns), key=lambda col: abs(col - Columns // 2))
+
+# Columns 1 to Columns - 2, which the evaluation rewards holding
+CENTER = sum(((1 << Rows) - 1) << (col * HEIGHT) for col in range(1, Columns - 1))
+
+
+def cell(row, col):
+    return 1 << (col * HEIGHT + row)
+
+
+def lineMasks():
+    """Every run of Goal cells on the board, as one bitmask each."""
+    masks = []
+    for row in range(Rows):
+        for col in range(Columns):
+            for rowStep, colStep in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                endRow, endCol = row + rowStep * (Goal - 1), col + colStep * (Goal - 1)
+                if 0 <= endRow < Rows and 0 <= endCol < Columns:
+                    masks.append(sum(cell(row + i * rowStep, col + i * colStep) for i in range(Goal)))
+    return masks
+
+
+WINDOWS = lineMasks()
+
+# Evaluation weight of a line holding 0 to 4 marbles of one player and no others
+THREAT_WEIGHTS = (0, 3, 5, 7, 0)
+
+# A line's marbles are kept as one code, first player's count + LINE_STEP[1] * second's
+LINE_STEP = (1, Goal + 1)
+
+
+def lineValue(code):
+    """Evaluation of one line for the first player: a line held by one player only scores for them."""
+    first, second = code % LINE_STEP[1], code // LINE_STEP[1]
+    if not second:
+        return THREAT_WEIGHTS[first]
+    if not first:
+        return -THREAT_WEIGHTS[second]
+    return 0
+
+
+# Lines through each cell, by bit index: at most Goal in each direction, so 16 in all
+CELL_WINDOWS = [
+    [index for index, window in enumerate(WINDOWS) if window >> bit & 1]
+    for bit in range(Columns * HEIGHT)
+]
+
+
+def lineGains(player):
+    """Change of a line's value for the first player when player adds a marble to it, by code."""
+    gains = [0] * (LINE_STEP[1] * (Goal + 1))
+    for first in range(Goal):
+        for second in range(Goal - first):
+            code = first + LINE_STEP[1] * second
+            gains[code] = lineValue(code + LINE_STEP[player]) - lineValue(code)
+    return gains
+
+
+LINE_GAINS = (lineGains(0), lineGains(1))
+
+# Change of the centre term for the first player when each player takes a cell, by bit index
+CENTER_GAINS = tuple(
+    [(CENTER >> bit & 1) * (1 - 2 * player) for bit in range(Columns * HEIGHT)] for player in range(2)
+)
+
+
+def isWin(stones):
+    """True if the stones hold four in a row, found with two shifts per direction."""
+    for shift in SHIFTS:
+        pairs = stones & (stones >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+class BitBoard:
+    """
+    A Connect Four position as one bitmask of stones per player and the next free bit of
+    each column. Moves are made and taken back in place.
+
+    It also keeps the marbles of every line and the evaluation of AdversarialSearch without
+    its win and draw checks, for the first player, up to date: playing a marble changes only
+    the lines through its cell, so the evaluation is read rather than recomputed.
+    """
+    __slots__ = ("stones", "heights", "moves", "lines", "score")
+
+    def __init__(self):
+        self.stones = [0, 0]
+        self.heights = [col * HEIGHT for col in range(Columns)]
+        self.moves = 0
+        # Code of each line in WINDOWS (see LINE_STEP)
+        self.lines = [0] * len(WINDOWS)
+        self.score = 0
+
+    @classmethod
+    def fromLists(cls, board, top, marbles):
+        """Builds a bitboard from the list board used by Board.py; marbles maps each marble to its player."""
+        state = cls()
+        for row in range(Rows):
+            for col in range(Columns):
+                marble = board[row][col]
+                if marble in marbles:
+                    state.place(col * HEIGHT + row, marbles[marble])
+        state.heights = [col * HEIGHT + top[col] for col in range(Columns)]
+        return state
+
+    def canPlay(self, col):
+        return self.heights[col] < col * HEIGHT + Rows
+
+    def place(self, bit, player):
+        self.stones[player] |= 1 << bit
+        self.moves += 1
+        lines = self.lines
+        gains = LINE_GAINS[player]
+        step = LINE_STEP[player]
+        score = self.score + CENTER_GAINS[player][bit]
+        for index in CELL_WINDOWS[bit]:
+            code = lines[index]
+            score += gains[code]
+            lines[index] = code + step
+        self.score = score
+
+    def play(self, col, player):
+        bit = self.heights[col]
+        self.heights[col] = bit + 1
+        self.place(bit, player)
+
+    def undo(self, col, player):
+        bit = self.heights[col] = self.heights[col] - 1
+        self.stones[player] ^= 1 << bit
+        self.moves -= 1
+        lines = self.lines
+        gains = LINE_GAINS[player]
+        step = LINE_STEP[player]
+        score = self.score - CENTER_GAINS[player][bit]
+        for index in CELL_WINDOWS[bit]:
+            code = lines[index] - step
+            score -= gains[code]
+            lines[index] = code
+        self.score = score
+
+    def key(self):
+        # The first player's stones plus the occupied cells shifted up by one per column
+        # identify the position exactly, so no hashing is needed
+        first, second = self.stones
+        return first + (first | second) + BOTTOM
+
+    def full(self):
+        return self.moves == Rows * Columns
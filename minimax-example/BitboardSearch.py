@@ -0,0 +1,190 @@
+# Import necessary modules and functions
+import time
+
+from Board import Columns
+from BitBoard import BitBoard, CENTER, ORDER, isWin
+from AdversarialSearch import EVALUATORS, playerMarbleStrings
+
+# Transposition table bounds: the stored value is exact, a lower bound (the search failed
+# high) or an upper bound (it failed low)
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Positions kept in the table between moves; it is cleared once it grows past this
+TABLE_LIMIT = 1 << 20
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search once the time limit has passed."""
+
+
+class BitboardSearch:
+    """
+    The same minimax search and evaluation as AdversarialSearch, on a bitboard that is
+    played and taken back in place, with a transposition table keyed on the position.
+    """
+
+    def __init__(self, marble, depth, timeLimit=None, evaluator="full"):
+        self.marble = marble # The maximizing players's marble
+        self.player = playerMarbleStrings[marble]
+        self.depth = depth
+        if evaluator not in EVALUATORS:
+            raise ValueError(f"unknown evaluator {evaluator!r}")
+        self.evaluator = evaluator
+        # Seconds a move may take, or None to always finish depth
+        self.timeLimit = timeLimit
+        self.deadline = float('inf')
+        # Position key -> (depth, bound, value, best column)
+        self.table = {}
+        # Cutoffs caused by each column for each player, which order the moves the table does not
+        self.history = [[0] * Columns for _ in range(2)]
+        self.nodes = 0
+        # Depth of the last search that finished
+        self.completed = -1
+
+    def findOptimalMove(self, board, top):
+        state = BitBoard.fromLists(board, top, playerMarbleStrings)
+        if len(self.table) > TABLE_LIMIT:
+            self.table.clear()
+        if self.timeLimit is not None:
+            self.deadline = time.perf_counter() + self.timeLimit
+
+        # Deepen one ply at a time: each pass leaves best moves in the table that order
+        # the next, which then prunes far more than it costs. A pass cut short by the time
+        # limit is thrown away.
+        bestMove = -1
+        self.completed = -1
+        for depth in range(self.depth + 1):
+            try:
+                bestMove = self.searchRoot(state, depth, bestMove)
+            except SearchTimeout:
+                break
+            self.completed = depth
+        return bestMove
+
+    def searchRoot(self, state, depth, firstMove):
+        bestMove = -1
+        bestValue = float('-inf')
+        alpha = float('-inf')
+        for col in self.orderedMoves(state, firstMove):
+            state.play(col, self.player)
+            moveValue = self.minimax(state, depth, alpha, float('inf'), False)
+            state.undo(col, self.player)
+
+            if moveValue > bestValue:
+                bestValue = moveValue
+                bestMove = col
+            alpha = max(alpha, moveValue)
+        return bestMove
+
+    def orderedMoves(self, state, firstMove, history=None):
+        moves = [col for col in ORDER if state.canPlay(col)]
+        if history is not None:
+            moves.sort(key=history.__getitem__, reverse=True)
+        if firstMove in moves:
+            moves.remove(firstMove)
+            moves.insert(0, firstMove)
+        return moves
+
+    def minimax(self, state, depth, alpha, beta, maximizingPlayer):
+        """
+        Minimax with Alpha-Beta pruning over the bitboard, as in AdversarialSearch.minimax.
+
+        Parameters:
+        - state (BitBoard): The current position; it is the same after the call as before.
+        - depth (int): Plies left to search. A depth of 0 returns the evaluation of the position.
+        - alpha (int): The best score that the maximizing player can guarantee at this level or above.
+        - beta (int): The best score that the minimizing player can guarantee at this level or above.
+        - maximizingPlayer (bool): True if our player moves next, False if the opponent does.
+
+        Returns:
+        - int: The evaluation score of the position for our player.
+        """
+        self.nodes += 1
+        if not self.nodes & 1023 and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+        # Only the player who just moved can have completed a line
+        mover = 1 - self.player if maximizingPlayer else self.player
+        if depth == 0 or isWin(state.stones[mover]) or state.full():
+            return self.evaluateBoard(state)
+
+        key = state.key()
+        entry = self.table.get(key)
+        firstMove = -1
+        if entry is not None:
+            entryDepth, bound, value, firstMove = entry
+            if entryDepth >= depth:
+                if bound == EXACT:
+                    return value
+                if bound == LOWER:
+                    alpha = max(alpha, value)
+                else:
+                    beta = min(beta, value)
+                if beta <= alpha:
+                    return value
+
+        alphaStart, betaStart = alpha, beta
+        player = self.player if maximizingPlayer else 1 - self.player
+        history = self.history[player]
+        moves = self.orderedMoves(state, firstMove, history)
+        bestMove = -1
+        if maximizingPlayer:
+            best = float('-inf')
+            for move in moves:
+                state.play(move, player)
+                eval = self.minimax(state, depth - 1, alpha, beta, False)
+                state.undo(move, player)
+                if eval > best:
+                    best = eval
+                    bestMove = move
+
+                # prunning
+                alpha = max(alpha, eval)
+                if beta <= alpha:
+                    history[move] += depth * depth
+                    break
+        else:
+            best = float('inf')
+            for move in moves:
+                state.play(move, player)
+                eval = self.minimax(state, depth - 1, alpha, beta, True)
+                state.undo(move, player)
+                if eval < best:
+                    best = eval
+                    bestMove = move
+
+                # pruning
+                beta = min(beta, eval)
+                if beta <= alpha:
+                    history[move] += depth * depth
+                    break
+
+        if best <= alphaStart:
+            bound = UPPER
+        elif best >= betaStart:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table[key] = (depth, bound, best, bestMove)
+        return best
+
+    def evaluateBoard(self, state):
+        mine = state.stones[self.player]
+        theirs = state.stones[1 - self.player]
+
+        # Check for immediate win/loss
+        if isWin(mine):
+            return 100
+        elif isWin(theirs):
+            return -100
+        elif state.full():
+            return 0
+
+        # Threats and center columns, kept up to date by the board as marbles are played
+        value = state.score if self.player == 0 else -state.score
+        if self.evaluator == "full":
+            return value
+        center = (mine & CENTER).bit_count() - (theirs & CENTER).bit_count()
+        return center if self.evaluator == "center" else value - center
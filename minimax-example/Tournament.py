@@ -0,0 +1,153 @@
+# Plays Connect Four games between two player configurations without the board display,
+# and reports how each one did.
+#
+#   python Tournament.py [--players bitboard:8,list:3] [--games N] [--workers N]
+#                        [--opening 2] [--seed 0] [--output FILE]
+#
+# A player is "random", "list:DEPTH" or "bitboard:DEPTH[:SECONDS]", the last with a time
+# limit per move. Either search takes ":eval=NAME" at the end to pick its evaluation, one
+# of "full" (the default), "threats" or "center", e.g. "bitboard:8:eval=center". The first
+# player alternates every game, and each game opens with a few random moves picked from
+# its seed, as are the moves of "random" players, so deterministic agents do not replay
+# the same game and --seed picks the games.
+# The games run on a process pool.
+
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from AgentPlayer import AgentPlayer
+from Board import Columns, Goal, Players, Rows, Status, checkDraw, checkWinner, playerMarble
+from RandomPlayer import RANPlayer
+
+
+def makePlayer(spec, marble, name):
+    """Builds the player a spec describes; see the top of this file."""
+    kind, *options = spec.split(":")
+    settings = dict(option.split("=", 1) for option in options if "=" in option)
+    options = [option for option in options if "=" not in option]
+    if kind == "random":
+        return RANPlayer(Rows, Columns, Goal)
+    if kind in ("list", "bitboard") and set(settings) <= {"eval"}:
+        depth = int(options[0]) if options else 3
+        timeLimit = float(options[1]) if len(options) > 1 else None
+        return AgentPlayer(marble, name, depth, kind, timeLimit, settings.get("eval", "full"))
+    raise ValueError(f"unknown player {spec!r}")
+
+
+def playGame(seed, specs, opening=2):
+    """
+    Plays one game and returns the winner's position in specs (None for a draw) and the
+    think time in seconds and nodes searched of every move, by position in specs. specs[0]
+    moves first in even games and specs[1] in odd ones.
+    """
+    seats = [0, 1] if seed % 2 == 0 else [1, 0]
+    players = [makePlayer(specs[position], playerMarble[seat], str(seat)) for seat, position in enumerate(seats)]
+    # RANPlayer seeds the shared generator from the clock, so seed it once they exist
+    random.seed(seed)
+    rng = random.Random(seed)
+
+    board = [[' ' for _ in range(Columns)] for _ in range(Rows)]
+    top = [0 for _ in range(Columns)]
+    times = [[] for _ in specs]
+    nodes = [[] for _ in specs]
+    player = Players - 1
+    status = Status.Continue
+    ply = 0
+    while status == Status.Continue:
+        player = (player + 1) % Players
+        position = seats[player]
+        if ply < opening:
+            col = rng.choice([c for c in range(Columns) if top[c] < Rows])
+        else:
+            agent = getattr(players[player], "agent", None)
+            searched = getattr(agent, "nodes", 0)
+            started = time.perf_counter()
+            col = players[player].move([row[:] for row in board], top[:])
+            times[position].append(time.perf_counter() - started)
+            nodes[position].append(getattr(agent, "nodes", 0) - searched)
+            if col < 0 or col >= Columns or top[col] >= Rows:
+                # An illegal move loses the game, as cheating does in main.py
+                return {"winner": seats[1 - player], "plies": ply, "times": times, "nodes": nodes}
+        board[top[col]][col] = playerMarble[player]
+        top[col] += 1
+        ply += 1
+
+        status = checkWinner(board, player)
+        if status != Status.Win:
+            status = checkDraw(top, Columns, Rows)
+
+    winner = position if status == Status.Win else None
+    return {"winner": winner, "plies": ply, "times": times, "nodes": nodes}
+
+
+def runTournament(specs, games, workers=None, opening=2, seed=0):
+    """Plays the games on a process pool and returns the results and search cost of each player."""
+    labels = [spec if specs.index(spec) == i else f"{spec}#{i + 1}" for i, spec in enumerate(specs)]
+    wins = [0] * len(specs)
+    times = [[] for _ in specs]
+    nodes = [0] * len(specs)
+    draws = 0
+    plies = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(
+            playGame,
+            range(seed, seed + games),
+            [specs] * games,
+            [opening] * games,
+            chunksize=max(1, games // (4 * (workers or os.cpu_count() or 1))),
+        )
+        for result in results:
+            plies += result["plies"]
+            if result["winner"] is None:
+                draws += 1
+            else:
+                wins[result["winner"]] += 1
+            for position in range(len(specs)):
+                times[position].extend(result["times"][position])
+                nodes[position] += sum(result["nodes"][position])
+
+    summary = []
+    for position, label in enumerate(labels):
+        moves = len(times[position])
+        seconds = sum(times[position])
+        losses = games - draws - wins[position]
+        summary.append({
+            "player": label,
+            "wins": wins[position],
+            "draws": draws,
+            "losses": losses,
+            "score": round((wins[position] + 0.5 * draws) / games, 4),
+            "avgMoveMs": round(1000 * seconds / moves, 2) if moves else 0.0,
+            "maxMoveMs": round(1000 * max(times[position], default=0.0), 2),
+            "nodes": nodes[position],
+            "nodesPerMove": round(nodes[position] / moves) if moves else 0,
+            "nodesPerSecond": round(nodes[position] / seconds) if seconds else 0,
+        })
+    return {"games": games, "draws": draws, "avgPlies": round(plies / games, 1), "players": summary}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--players", default="bitboard:8,list:3", help="two comma-separated players")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=None, help="processes to play on (default: all cores)")
+    parser.add_argument("--opening", type=int, default=2, help="random moves at the start of every game")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--output", help="file to write the results to instead of stdout")
+    args = parser.parse_args()
+
+    specs = args.players.split(",")
+    if len(specs) != Players:
+        parser.error(f"--players needs {Players} players")
+    report = runTournament(specs, args.games, args.workers, args.opening, args.seed)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
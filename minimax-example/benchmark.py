@@ -0,0 +1,87 @@
+# Benchmarks of the Connect Four search backends.
+#
+#   python benchmark.py [--positions 20] [--depth 3] [--time 1.0] [--seed 0]
+#
+# Both backends search the same random positions to the same depth, and report the states
+# searched per second and the time per move. The bitboard backend then searches each
+# position for a fixed time, to show the depth it reaches per move.
+
+import argparse
+import json
+import random
+import time
+
+from AdversarialSearch import AdversarialSearch, playerMarbleStrings
+from BitboardSearch import BitboardSearch
+from Board import Columns, Rows, Status, checkWinner, playerMarble
+
+# Moves played at random before a position is searched
+OPENING_MOVES = (0, 4, 8, 12, 16, 20)
+
+
+def randomPosition(rng, moves):
+    """
+    Plays moves random marbles from the empty board and returns the board, the column
+    tops and the marble to move, or None if a player won on the way.
+    """
+    board = [[' ' for _ in range(Columns)] for _ in range(Rows)]
+    top = [0 for _ in range(Columns)]
+    for ply in range(moves):
+        marble = playerMarble[ply % 2]
+        col = rng.choice([c for c in range(Columns) if top[c] < Rows])
+        board[top[col]][col] = marble
+        top[col] += 1
+        if checkWinner(board, playerMarbleStrings[marble]) == Status.Win:
+            return None
+    return board, top, playerMarble[moves % 2]
+
+
+def positions(count, seed):
+    rng = random.Random(seed)
+    found = []
+    while len(found) < count:
+        position = randomPosition(rng, OPENING_MOVES[len(found) % len(OPENING_MOVES)])
+        if position is not None:
+            found.append(position)
+    return found
+
+
+def searchAll(games, makeSearch):
+    """Searches every position with a fresh search and sums up the nodes and time."""
+    nodes = 0
+    seconds = []
+    depths = []
+    for board, top, marble in games:
+        search = makeSearch(marble)
+        started = time.perf_counter()
+        search.findOptimalMove(board, top)
+        seconds.append(time.perf_counter() - started)
+        nodes += search.nodes
+        depths.append(getattr(search, "completed", search.depth))
+    total = sum(seconds)
+    return {
+        "positions": len(games),
+        "nodes": nodes,
+        "nodesPerSecond": round(nodes / total) if total else 0,
+        "meanMoveMs": round(1000 * total / len(games), 2),
+        "maxMoveMs": round(1000 * max(seconds), 2),
+        "meanDepth": round(sum(depths) / len(depths), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positions", type=int, default=18)
+    parser.add_argument("--depth", type=int, default=3, help="depth both backends search to")
+    parser.add_argument("--time", type=float, default=1.0, help="seconds per move of the timed bitboard run")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    games = positions(args.positions, args.seed)
+    runs = (
+        ("list", lambda marble: AdversarialSearch(marble, args.depth)),
+        ("bitboard", lambda marble: BitboardSearch(marble, args.depth)),
+        ("bitboard-timed", lambda marble: BitboardSearch(marble, 42, args.time)),
+    )
+    for name, makeSearch in runs:
+        print(json.dumps({"backend": name, **searchAll(games, makeSearch)}))
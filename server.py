@@ -1,46 +1,194 @@
+import asyncio
+import atexit
 import logging
 import os
+import signal
+import sys
+import threading
+import time
 import typing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from flask import Flask
+from flask import g
 from flask import request
 
+import Log
+import Protocol
+import Replay
+import SearchPool
 
-def run_server(handlers: typing.Dict):
+# "asgi" serves with uvicorn and runs the handlers on a thread pool; "flask" is the
+# single-process development server
+SERVER_MODE = os.environ.get("SERVER_MODE", "asgi")
+
+# Handler threads in ASGI mode, i.e. how many requests are worked on at once
+SERVER_THREADS = int(os.environ.get("SERVER_THREADS", "8"))
+
+# Latencies kept per endpoint for the percentiles
+LATENCY_SAMPLES = 1000
+
+
+class LatencyStats:
+    """The most recent request latencies of each endpoint, summarised as percentiles."""
+
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.samples = samples
+        self.latencies = {}
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint, seconds):
+        with self.lock:
+            latencies = self.latencies.get(endpoint)
+            if latencies is None:
+                latencies = self.latencies[endpoint] = deque(maxlen=self.samples)
+                self.counts[endpoint] = 0
+            latencies.append(seconds)
+            self.counts[endpoint] += 1
+
+    def summary(self):
+        """Returns the request count and p50/p99 latency in milliseconds of every endpoint."""
+        with self.lock:
+            latencies = {endpoint: sorted(values) for endpoint, values in self.latencies.items()}
+            counts = dict(self.counts)
+
+        def percentile(values, p):
+            return round(values[min(len(values) - 1, int(p * len(values)))] * 1000, 2)
+
+        return {
+            endpoint: {"count": counts[endpoint], "p50_ms": percentile(values, 0.5), "p99_ms": percentile(values, 0.99)}
+            for endpoint, values in latencies.items()
+        }
+
+
+def flask_app(handlers: typing.Dict, latency: LatencyStats):
     app = Flask("Battlesnake")
 
+    def as_json(value):
+        return app.response_class(Protocol.dumps(value), mimetype="application/json")
+
     @app.get("/")
     def on_info():
-        return handlers["info"]()
+        return as_json(handlers["info"]())
 
     @app.post("/start")
     def on_start():
-        game_state = request.get_json()
+        game_state = Protocol.loads(request.get_data())
         handlers["start"](game_state)
         return "ok"
 
     @app.post("/move")
     def on_move():
-        game_state = request.get_json()
-        return handlers["move"](game_state)
+        parsing = time.perf_counter()
+        # The move clock counts from when the request arrived, before its body was read
+        game_state = Protocol.decodeMove(request.get_data(), received=g.started)
+        latency.record("/move parse", time.perf_counter() - parsing)
+        return as_json(handlers["move"](game_state))
 
     @app.post("/end")
     def on_end():
-        game_state = request.get_json()
+        game_state = Protocol.loads(request.get_data())
         handlers["end"](game_state)
         return "ok"
 
+    @app.get("/stats")
+    def on_stats():
+        return latency.summary()
+
+    @app.before_request
+    def start_timer():
+        g.started = time.perf_counter()
+
     @app.after_request
     def identify_server(response):
         response.headers.set(
             "server", "battlesnake/github/starter-snake-python"
         )
+        if request.path != "/stats":
+            latency.record(request.path, time.perf_counter() - g.started)
         return response
 
+    return app
+
+
+def asgi_app(handlers: typing.Dict, latency: LatencyStats):
+    from starlette.applications import Starlette
+    from starlette.responses import PlainTextResponse, Response
+    from starlette.routing import Route
+
+    # The event loop only reads requests and writes responses; the handlers, and so the
+    # search, run on these threads so new requests keep being accepted meanwhile
+    executor = ThreadPoolExecutor(max_workers=SERVER_THREADS, thread_name_prefix="handler")
+    headers = {"server": "battlesnake/github/starter-snake-python"}
+
+    def endpoint(name, path, respond):
+        async def on_request(request):
+            started = time.perf_counter()
+            args = ()
+            if request.method == "POST":
+                body = await request.body()
+                if name == "move":
+                    # Decoding and building the search state, timed on their own; the
+                    # move clock counts from arrival, so time spent reading the body and
+                    # waiting for a handler thread comes out of the search's budget
+                    parsing = time.perf_counter()
+                    args = (Protocol.decodeMove(body, received=started),)
+                    latency.record("/move parse", time.perf_counter() - parsing)
+                else:
+                    args = (Protocol.loads(body),)
+            result = await asyncio.get_running_loop().run_in_executor(executor, handlers[name], *args)
+            response = respond(result)
+            latency.record(path, time.perf_counter() - started)
+            return response
+
+        return on_request
+
+    def as_json(result):
+        return Response(Protocol.dumps(result), media_type="application/json", headers=headers)
+
+    def as_ok(result):
+        return PlainTextResponse("ok", headers=headers)
+
+    async def on_stats(request):
+        return as_json(latency.summary())
+
+    routes = [
+        Route("/", endpoint("info", "/", as_json), methods=["GET"]),
+        Route("/start", endpoint("start", "/start", as_ok), methods=["POST"]),
+        Route("/move", endpoint("move", "/move", as_json), methods=["POST"]),
+        Route("/end", endpoint("end", "/end", as_ok), methods=["POST"]),
+        Route("/stats", on_stats, methods=["GET"]),
+    ]
+    app = Starlette(routes=routes, on_shutdown=[lambda: executor.shutdown(wait=False, cancel_futures=True)])
+    return app
+
+
+def run_server(handlers: typing.Dict):
     host = "0.0.0.0"
     port = int(os.environ.get("PORT", "8000"))
+    latency = LatencyStats()
 
     logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    Log.setup()
+
+    # Search workers are started once and reused by every move until the server exits;
+    # SIGTERM (docker stop) goes through the same clean shutdown as Ctrl+C
+    SearchPool.start()
+    atexit.register(SearchPool.shutdown)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    # Every game is recorded so that its moves can be searched again offline
+    if Replay.REPLAY_DIR:
+        recorder = Replay.Recorder()
+        atexit.register(recorder.close)
+        handlers = Replay.recording(handlers, recorder)
+
+    Log.info("listening", url=f"http://{host}:{port}", mode=SERVER_MODE)
+    if SERVER_MODE == "flask":
+        flask_app(handlers, latency).run(host=host, port=port)
+    else:
+        import uvicorn
 
-    print(f"\nRunning Battlesnake at http://{host}:{port}")
-    app.run(host=host, port=port)
+        uvicorn.run(asgi_app(handlers, latency), host=host, port=port, log_level="warning", access_log=False)